@@ -1,12 +1,42 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import time
 import json
+import logging
 import random
+import asyncio
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from .browserpool import get_pool, BROWSER_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Dedicated threads for blocking Selenium work, one per pooled browser
+_executor = ThreadPoolExecutor(max_workers=BROWSER_POOL_SIZE, thread_name_prefix="xbot")
+
+# All visible tweets in one round-trip: text and the metrics aria-label
+EXTRACT_TWEETS_JS = """
+return Array.from(document.querySelectorAll('article')).slice(0, arguments[0]).map(function (article) {
+    var text = article.querySelector('div[lang]');
+    var group = article.querySelector("div[role='group']");
+    return {
+        text: text ? text.innerText : null,
+        aria_label: group ? group.getAttribute('aria-label') : null
+    };
+});
+"""
+
+class ScrapeCancelled(Exception):
+    pass
+
+def pause(seconds, cancel=None):
+    """Sleep that returns early, raising ScrapeCancelled, once `cancel` is set."""
+    if cancel is None:
+        time.sleep(seconds)
+    elif cancel.wait(seconds):
+        raise ScrapeCancelled()
 
 def load_cookies_from_file(file_path):
     """Load cookies from a JSON file."""
@@ -37,30 +67,25 @@ def login_to_twitter(driver, username, password):
 
     WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, "main")))  # Wait until logged in
 
-def scroll_to_load(driver, pause_time=2):
+def scroll_to_load(driver, pause_time=2, cancel=None):
     """Scrolls down the page to load more content."""
     last_height = driver.execute_script("return document.body.scrollHeight")
     while True:
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(random.uniform(pause_time, pause_time + 1))  # Randomize scrolling intervals
+        pause(random.uniform(pause_time, pause_time + 1), cancel)  # Randomize scrolling intervals
         new_height = driver.execute_script("return document.body.scrollHeight")
         if new_height == last_height:
             break
         last_height = new_height
 
-# Selenium setup
-chrome_options = Options()
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--headless")  
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--disable-extensions")
-chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-chrome_options.add_experimental_option("useAutomationExtension", False)
-
-service = Service("C:/chromedriver-win64/chromedriver.exe")
-driver = webdriver.Chrome(service=service, options=chrome_options)
+def x_pool(cookies_path=None, username=None, password=None):
+    """Shared pool of logged-in X drivers; the first caller's credentials log in every new browser."""
+    def login(driver):
+        if cookies_path:
+            inject_cookies(driver, load_cookies_from_file(cookies_path))
+        elif username and password:
+            login_to_twitter(driver, username, password)
+    return get_pool("X", login=login)
 
 def calculate_engagement_score(metrics):
     """Calculate the engagement score from metrics."""
@@ -72,81 +97,75 @@ def calculate_engagement_score(metrics):
     except ValueError:
         return 0
 
-def search_tweets_with_selenium(keywords_list, cookies_path=None, username=None, password=None, max_results=10):
+def parse_metrics(aria_label):
+    """Replies, reposts and likes from a tweet's action bar aria-label."""
+    metrics = {
+        "comments": "0",
+        "retweets": "0",
+        "likes": "0",
+    }
+    if aria_label:
+        parts = aria_label.split(", ")
+        for part in parts:
+            if "replies" in part:
+                metrics["comments"] = part.split()[0]
+            elif "reposts" in part:
+                metrics["retweets"] = part.split()[0]
+            elif "likes" in part:
+                metrics["likes"] = part.split()[0]
+    return metrics
+
+def search_tweets_with_selenium(keywords_list, cookies_path=None, username=None, password=None, max_results=10, cancel=None):
     try:
-        if cookies_path:
-            cookies = load_cookies_from_file(cookies_path)
-            inject_cookies(driver, cookies)
-        elif username and password:
-            login_to_twitter(driver, username, password)
-
-        query = ' OR '.join(keywords_list)
-        url = f"https://twitter.com/search?q={query.replace(' ', '%20')}&src=typed_query&f=live"
-        driver.get(url)
-
-        wait = WebDriverWait(driver, 30)
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "main")))
-
-        # Retry logic for loading tweets
-        for _ in range(3):
-            try:
-                WebDriverWait(driver, 15).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "article")))
-                break
-            except:
-                print("Retrying to load tweets...")
-                driver.refresh()
-                time.sleep(random.uniform(5, 7))
-
-        # Scroll to load more tweets
-        scroll_to_load(driver)
-
-        tweets_data = []
-        tweets = driver.find_elements(By.CSS_SELECTOR, "article")[:max_results]
-        for tweet in tweets:
-            try:
-                time.sleep(random.uniform(1, 2))  # Mimic human reading time per tweet
-                text = tweet.find_element(By.CSS_SELECTOR, "div[lang]").text
-
-                # Extract engagement metrics using aria-label
-                aria_label = tweet.find_element(By.CSS_SELECTOR, "div[role='group']").get_attribute("aria-label")
-                metrics = {
-                    "comments": "0",
-                    "retweets": "0",
-                    "likes": "0",
-                }
-                if aria_label:
-                    parts = aria_label.split(", ")
-                    for part in parts:
-                        if "replies" in part:
-                            metrics["comments"] = part.split()[0]
-                        elif "reposts" in part:
-                            metrics["retweets"] = part.split()[0]
-                        elif "likes" in part:
-                            metrics["likes"] = part.split()[0]
-
-                engagement_score = calculate_engagement_score(metrics)
-
-                tweets_data.append({
-                    "Tweet": text,
-                    "metrics": metrics,
-                    "engagement_score": engagement_score
-                })
-            except Exception as e:
-                print(f"Error extracting tweet: {e}")
-
-        return tweets_data
-
+        with x_pool(cookies_path, username, password).driver() as driver:
+            return _search_tweets(driver, keywords_list, max_results, cancel)
+    except ScrapeCancelled:
+        logger.info("X scrape cancelled.", extra={"source": "X"})
+        return []
     except Exception as e:
-        import traceback
-        print(f"Error during Selenium scraping: {e}")
-        print(traceback.format_exc())
+        logger.exception("Error during Selenium scraping: %s", e, extra={"source": "X"})
         return []
 
-    finally:
-        driver.quit()
+def _search_tweets(driver, keywords_list, max_results, cancel=None):
+    query = ' OR '.join(keywords_list)
+    url = f"https://twitter.com/search?q={query.replace(' ', '%20')}&src=typed_query&f=live"
+    driver.get(url)
+
+    wait = WebDriverWait(driver, 30)
+    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "main")))
+
+    # Retry logic for loading tweets
+    for _ in range(3):
+        try:
+            WebDriverWait(driver, 15).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "article")))
+            break
+        except:
+            logger.info("Retrying to load tweets...", extra={"source": "X"})
+            driver.refresh()
+            pause(random.uniform(5, 7), cancel)
+
+    # Scroll to load more tweets
+    scroll_to_load(driver, cancel=cancel)
+
+    tweets_data = []
+    for tweet in driver.execute_script(EXTRACT_TWEETS_JS, max_results):
+        if not tweet["text"]:
+            continue  # Ads and placeholders have no tweet text
+        metrics = parse_metrics(tweet["aria_label"])
+        tweets_data.append({
+            "Tweet": tweet["text"],
+            "metrics": metrics,
+            "engagement_score": calculate_engagement_score(metrics)
+        })
+
+    return tweets_data
 
 async def Xposts(keywords, cookies_path, username=None, password=None):
-    
+    """
+    Awaitable X search. The scrape runs on the dedicated executor; cancelling
+    this coroutine stops the scrape at its next pause and returns the
+    browser to the pool.
+    """
     keywords = list(set(keyword.strip() for keyword in keywords))
 
     # Define cookies file path or login credentials
@@ -154,15 +173,21 @@ async def Xposts(keywords, cookies_path, username=None, password=None):
     username = None
     password = None
 
-    tweets = search_tweets_with_selenium(
+    cancel = threading.Event()
+    scrape = partial(
+        search_tweets_with_selenium,
         keywords,
         cookies_path=cookies_path,
         username=username,
         password=password,
-        max_results=10
+        max_results=10,
+        cancel=cancel
     )
-
-    return tweets  # Return the fetched tweets
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, scrape)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
 
 if __name__ == '__main__':
     Xposts()
@@ -1,16 +1,30 @@
 import asyncio
+import logging
 from .redditbot import redditposts
 from .telegrambot2 import TelegramPosts, send_notification
 from .Xbot import Xposts
 from .fbapi import search_posts
-import nltk
+import time
 import datetime
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from sentimentservice import get_sentiment_service
+from postarchive import get_archive, post_key, post_timestamp
+from logsetup import setup_logging
+from .keywordmatcher import coin_matcher
+from .dedupe import collapse_duplicates
+from .coinsentiment import get_coin_sentiment, SENTIMENT_HALF_LIFE
 
-try:
-    nltk.data.find('sentiment/vader_lexicon.zip')
-except LookupError:
-    nltk.download('vader_lexicon')
+logger = logging.getLogger(__name__)
+
+# Seconds each source may take before it is cancelled
+SOURCE_DEADLINES = {
+    "Telegram": 60,
+    "Reddit": 60,
+    "X": 120,
+    "Facebook": 180,
+}
+
+# Only Telegram messages this recent are scored each cycle
+TELEGRAM_LOOKBACK = 24 * 3600  # seconds
 
 def parse_posts(posts):
     """
@@ -21,12 +35,13 @@ def parse_posts(posts):
         parsed_posts.append(post)
     return parsed_posts
 
-def compute_sentiment_score(post_text, analyzer):
+def compute_sentiment_score(post_text, sentiment=None):
     """
-    Computes the sentiment score of a given text.
+    Computes the sentiment score of a given text (or categorizes an
+    already computed score).
     """
-    scores = analyzer.polarity_scores(post_text)
-    sentiment = (scores['compound'] + 1) / 2.0  # range [0, 1]
+    if sentiment is None:
+        sentiment = get_sentiment_service().score(post_text)  # range [0, 1]
     if sentiment >= 0.75:
         sentiment_category = 'Very Positive'
     elif sentiment >= 0.5:
@@ -39,129 +54,198 @@ def compute_sentiment_score(post_text, analyzer):
         sentiment_category = 'Neutral'
     return sentiment, sentiment_category
 
+def post_text(post):
+    """The text of a post from any source."""
+    return '\n'.join(str(post.get(field) or '') for field in ('title', 'selftext', 'message', 'Tweet'))
+
 def analyze_sentiments(posts):
     """
     Analyzes sentiments of a list of posts using engagement score as weight.
     """
-    analyzer = SentimentIntensityAnalyzer()
+    # One batch call; posts already seen in earlier cycles come from the cache
+    sentiments = get_sentiment_service().score_batch([post_text(post) for post in posts])
+
     total_weighted_sentiment = 0
     total_engagement = 0
+    for post, sentiment in zip(posts, sentiments):
+        engagement_score = post.get('engagement_score', 0)
+        total_weighted_sentiment += sentiment * engagement_score
+        total_engagement += engagement_score
 
-    # For normalization
-    max_engagement = max([p.get('engagement_score', 0) for p in posts], default=1)
+    if total_engagement == 0:
+        return 0
+    return total_weighted_sentiment / total_engagement
 
-    for post in posts:
-        post_text = post.get('title', 'group_name') + ' ' + post.get('selftext', 'message')
-        sentiment, category = compute_sentiment_score(post_text, analyzer)
+def overall_category(sentiment):
+    if sentiment >= 0.80:
+        return 'Very Positive'
+    elif sentiment >= 0.60:
+        return 'Positive'
+    elif sentiment >= 0.40:
+        return 'Neutral'
+    elif sentiment >= 0.20:
+        return 'Negative'
+    return 'Very Negative'
 
-        engagement_score = post.get('engagement_score', 0)
-        normalized_engagement = engagement_score / max_engagement if max_engagement else 0
+class SocialSnapshot:
+    """
+    Posts from every source collected once per scan cycle. All coins are
+    matched against this in memory instead of re-running the bots per coin.
+    """
+    def __init__(self, posts, sources=None, aggregates=None, raw_posts=None):
+        self.posts = posts
+        # Every post before duplicates were collapsed; the running sentiment
+        # keys and weighs each copy on its own so re-served copies count once
+        self.raw_posts = posts if raw_posts is None else raw_posts
+        self.sources = sources or {}  # source name -> status, post count, latency
+        self.aggregates = aggregates or get_coin_sentiment()  # decayed sentiment per coin, across cycles
+        self.collected_at = datetime.datetime.now()
+        self._by_coin = {}  # coin -> posts mentioning it
+        self._sentiment = None
 
-        weighted_sentiment = sentiment * normalized_engagement
-        total_weighted_sentiment += weighted_sentiment
-        total_engagement += normalized_engagement
+    post_text = staticmethod(post_text)
 
-        # Print info for debug
-        if 'title' in post and post['title']:
-            print(f"Post: {post['title']}")
-        elif 'message' in post and post['message']:
-            print(f"Message: {post['message']}")
-        else:
-            print(f"Tweet: {post.get('Tweet', '')}")
+    def index_coins(self, coins, names=None):
+        """
+        Find the mentions of every coin in `coins` with one pass over the
+        posts, and fold posts not seen in earlier cycles into the coins'
+        running sentiment. The sentiment is fed from `raw_posts`, so each
+        copy of a collapsed post is keyed and weighed by itself.
+        """
+        coins = [coin.upper() for coin in coins if coin.upper() not in self._by_coin]
+        if not coins:
+            return
+        matcher = coin_matcher(coins, names)
+        for coin in coins:
+            self._by_coin[coin] = []
+        for post in self.posts:
+            for coin in matcher.labels(self.post_text(post)):
+                self._by_coin[coin].append(post)
+        mentions = []
+        for post in self.raw_posts:
+            found = matcher.labels(self.post_text(post))
+            if found:
+                mentions.append((post, found))
 
-        print(f"Sentiment Score: {sentiment:.2f} ({category}), Engagement Score: {engagement_score:.2f}\n")
+        sentiments = get_sentiment_service().score_batch([self.post_text(post) for post, _ in mentions])
+        now = self.collected_at.timestamp()
+        for (post, found), sentiment in zip(mentions, sentiments):
+            ts = post_timestamp(post, now)
+            key = post_key('', post)
+            for coin in found:
+                self.aggregates.add(coin, sentiment, post.get('engagement_score', 0), ts, key)
 
-    if total_engagement == 0:
-        return 0
-    average_sentiment = total_weighted_sentiment / total_engagement
-    return average_sentiment
+    def coin_posts(self, coin):
+        self.index_coins([coin])
+        return self._by_coin[coin.upper()]
 
-async def sentiment_scores(keywords, subreddits, coin, group_id, cookies_file, fb_cookies):
+    def coin_duplicates(self, coin):
+        """Copies of posts mentioning `coin` beyond the first; spam bursts push this up."""
+        return sum(post.get('duplicate_count', 0) for post in self.coin_posts(coin))
+
+    def top_post(self, coin):
+        """The post mentioning `coin` with the highest engagement, or None."""
+        return max(self.coin_posts(coin), key=lambda x: x.get('engagement_score', 0), default=None)
+
+    def sentiment(self):
+        """Engagement-weighted sentiment over all posts, computed once per snapshot."""
+        if self._sentiment is None:
+            self._sentiment = analyze_sentiments(self.posts)
+        return self._sentiment
+
+    def coin_sentiment(self, coin, half_life=SENTIMENT_HALF_LIFE):
+        """
+        (sentiment, category, highest engagement post) for `coin`, like
+        `sentiment_scores`. The sentiment is the coin's decayed running
+        average over `half_life` seconds, not just this snapshot's posts.
+        """
+        highest_engagement_post = self.top_post(coin)
+        if highest_engagement_post is None:
+            logger.debug("No posts found mentioning %s with engagement scores.", coin, extra={"coin": coin, "stage": "sentiment"})
+            return 0, 'Neutral', None
+
+        logger.debug("Highest Engagement Post: %s", highest_engagement_post, extra={"coin": coin, "stage": "sentiment"})
+        sentiment = self.aggregates.sentiment(coin.upper(), half_life)
+        return sentiment, overall_category(sentiment), highest_engagement_post
+
+async def collect_source(name, coro, deadline):
     """
-    Runs each bot in sequence (Telegram, Reddit, X/Twitter, Facebook), 
-    combines all posts, writes to a file, sends file to Telegram, 
-    and returns sentiment info.
+    Await one source under its own deadline. Returns (posts, status) and never
+    raises, so a slow or broken source only loses its own posts.
     """
-
-    # 1) Run bots one by one instead of all at once
-    print("Running Telegram bot...")
-    telegram_data = await TelegramPosts()
-    telegram_posts = parse_posts(telegram_data)
-    print("Telegram bot finished.\n")
-
-    print("Running Reddit bot...")
-    reddit_data = await redditposts(keywords, subreddits, 10)
-    reddit_posts_parsed = parse_posts(reddit_data)
-    print("Reddit bot finished.\n")
-
-    print("Running X (Twitter) bot...")
-    twitter_data = await Xposts(keywords, cookies_file)
-    twitter_posts = parse_posts(twitter_data)
-    print("X bot finished.\n")
-
-    print("Running Facebook bot...")
-    facebook_data = await search_posts(group_id, keywords, fb_cookies)
-    facebook_posts = parse_posts(facebook_data)
-    print("Facebook bot finished.\n")
-
-    # 2) Combine posts
-    parsed_posts = telegram_posts + reddit_posts_parsed + twitter_posts + facebook_posts
-
-    # 3) Write all posts to a text file with timestamp
-    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    file_name = f"POSTDATA/{timestamp}.txt"
+    started = time.monotonic()
     try:
-        with open(file_name, "w", encoding="utf-8") as f:
-            for post in parsed_posts:
-                f.write(str(post) + "\n")
-        print(f"All posts saved to {file_name}")
+        posts = parse_posts(await asyncio.wait_for(coro, timeout=deadline))
+        status = {"status": "ok", "posts": len(posts)}
+    except asyncio.TimeoutError:
+        posts, status = [], {"status": "timeout", "posts": 0}
     except Exception as e:
-        print(f"Failed to write posts to file: {e}")
+        posts, status = [], {"status": "error", "posts": 0, "error": str(e)}
+    status["latency"] = time.monotonic() - started
+    detail = f": {status['error']}" if "error" in status else ""
+    logger.info("%s bot: %s%s (%d posts)", name, status['status'], detail, status['posts'],
+                extra={"source": name, "stage": "collect", "latency": status["latency"]})
+    return posts, status
 
-    # 4) Send file name to Telegram
-    """try:
-        await send_notification(file_name)
-        print(f"Post lists File {file_name} sent to Telegram bot.")
-    except Exception as e:
-        print(f"Failed to send file to Telegram: {e}")"""
-
-    # 5) Filter posts containing the coin
-    filtered_posts = [
-        post for post in parsed_posts
-        if coin.lower() in post.get('selftext', '').lower()
-           or coin.lower() in post.get('message', '').lower()
-    ]
-
-    # 6) Find the post with the highest engagement
-    highest_engagement_post = max(
-        filtered_posts,
-        key=lambda x: x.get('engagement_score', 0),
-        default=None
-    )
+async def collect_social_snapshot(keywords, subreddits, group_id, cookies_file, fb_cookies, deadlines=None):
+    """
+    Runs every bot concurrently (Telegram, Reddit, X/Twitter, Facebook), each
+    with its own deadline, combines whatever posts came back, archives them,
+    collapses duplicates and returns a SocialSnapshot with per-source status
+    and latency.
+    """
+    deadlines = {**SOURCE_DEADLINES, **(deadlines or {})}
 
-    if highest_engagement_post is None:
-        print(f"No posts found mentioning {coin} with engagement scores.")
-        return 0, 'Neutral', None
+    # 1) Run all bots at once; each one is cancelled at its own deadline
+    logger.info("Running social bots...")
+    sources = {
+        "Telegram": TelegramPosts(listen=False, since=time.time() - TELEGRAM_LOOKBACK),
+        "Reddit": redditposts(keywords, subreddits, 10),
+        "X": Xposts(keywords, cookies_file),
+        "Facebook": search_posts(group_id, keywords, fb_cookies),
+    }
+    results = await asyncio.gather(*[
+        collect_source(name, coro, deadlines[name]) for name, coro in sources.items()
+    ])
+    source_status = {name: status for name, (_, status) in zip(sources, results)}
 
-    print(f"Highest Engagement Post: {highest_engagement_post}")
+    # 2) Combine posts (partial if some sources failed)
+    parsed_posts = [post for posts, _ in results for post in posts]
 
-    # 7) Analyze sentiment
-    sentiment = analyze_sentiments(parsed_posts)
-    if sentiment >= 0.80:
-        sentiment_category = 'Very Positive'
-    elif sentiment >= 0.60:
-        sentiment_category = 'Positive'
-    elif sentiment >= 0.40:
-        sentiment_category = 'Neutral'
-    elif sentiment >= 0.20:
-        sentiment_category = 'Negative'
-    else:
-        sentiment_category = 'Very Negative'
+    # 3) Archive the posts not archived before, one compressed batch per source
+    collected_at = time.time()
+    try:
+        archive = get_archive()
+        archived = 0
+        for name, (posts, _) in zip(sources, results):
+            archived += await asyncio.to_thread(archive.append, name, posts, collected_at)
+        logger.info("Archived %d new posts to %s", archived, archive.root, extra={"stage": "archive"})
+    except Exception as e:
+        logger.error("Failed to archive posts: %s", e, extra={"stage": "archive"})
 
-    return sentiment, sentiment_category, highest_engagement_post
+    # 4) Collapse copy-pasted posts across sources so each text is weighed and scored once;
+    #    only posts naming the same coins are merged, so one template can't swallow another coin
+    matcher = coin_matcher(keywords)
+    unique_posts = collapse_duplicates(
+        parsed_posts, SocialSnapshot.post_text,
+        key=lambda post: frozenset(matcher.labels(SocialSnapshot.post_text(post)))
+    )
+    logger.info("%d posts, %d after collapsing duplicates", len(parsed_posts), len(unique_posts), extra={"stage": "dedupe"})
+
+    return SocialSnapshot(unique_posts, source_status, raw_posts=parsed_posts)
+
+async def sentiment_scores(keywords, subreddits, coin, group_id, cookies_file, fb_cookies):
+    """
+    Collects a fresh snapshot and returns sentiment info for a single coin.
+    When scanning several coins, collect one snapshot with
+    `collect_social_snapshot` and call `coin_sentiment` on it per coin.
+    """
+    snapshot = await collect_social_snapshot(keywords, subreddits, group_id, cookies_file, fb_cookies)
+    return snapshot.coin_sentiment(coin)
 
 # Example usage
 if __name__ == "__main__":
+    setup_logging()
     group_id = "1766546466973495"
     fb_cookies = "SOCIALBOTS/fbcookies.json"
     cookies_file = "SOCIALBOTS/cookies.json"
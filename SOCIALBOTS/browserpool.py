@@ -0,0 +1,197 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+
+logger = logging.getLogger(__name__)
+
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH", "C:/chromedriver-win64/chromedriver.exe")
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "20"))
+
+
+def headless_options():
+    chrome_options = Options()
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option("useAutomationExtension", False)
+    return chrome_options
+
+
+class BrowserPool:
+    """
+    Warm, logged-in Chrome drivers that scrapers check out and return.
+
+    New drivers run `login(driver)` once (cookie injection or a form login);
+    a driver is health-checked on checkout and quit after `max_uses`
+    checkouts or when a scrape reports it broken. At most `size` drivers
+    exist at once; further checkouts wait for one to be returned.
+    """
+    def __init__(self, name, login=None, size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES,
+                 options=headless_options, driver_path=CHROMEDRIVER_PATH):
+        self.name = name
+        self.login = login
+        self.size = size
+        self.max_uses = max_uses
+        self.options = options
+        self.driver_path = driver_path
+        self._idle = []      # drivers ready for checkout, most recently used last
+        self._uses = {}      # driver -> checkouts so far
+        self._created = 0    # drivers alive (idle or checked out)
+        self._cond = threading.Condition()
+
+    def _create(self):
+        driver = webdriver.Chrome(service=Service(self.driver_path), options=self.options())
+        try:
+            if self.login is not None:
+                self.login(driver)
+        except Exception:
+            driver.quit()
+            raise
+        logger.info(f"{self.name} pool: started a new browser.")
+        return driver
+
+    @staticmethod
+    def is_healthy(driver):
+        try:
+            driver.execute_script("return document.readyState")
+            return True
+        except WebDriverException:
+            return False
+
+    def _discard(self, driver):
+        self._uses.pop(driver, None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"{self.name} pool: error quitting browser: {e}")
+
+    def acquire(self, timeout=None):
+        """Check out a healthy driver, starting one if the pool has room."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._created >= self.size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"No {self.name} browser available")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    driver = self._idle.pop()
+                else:
+                    driver = None
+                    self._created += 1  # Reserve the slot before the slow start
+
+            if driver is None:
+                try:
+                    driver = self._create()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+                self._uses[driver] = 0
+            elif not self.is_healthy(driver):
+                logger.info(f"{self.name} pool: replacing an unresponsive browser.")
+                self._discard(driver)
+                with self._cond:
+                    self._created -= 1
+                continue
+
+            self._uses[driver] += 1
+            return driver
+
+    def release(self, driver, broken=False):
+        """Return a driver; broken or worn-out drivers are quit instead of reused."""
+        if broken or self._uses.get(driver, self.max_uses) >= self.max_uses:
+            self._discard(driver)
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        driver = self.acquire(timeout)
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken)
+
+    @asynccontextmanager
+    async def session(self, timeout=None):
+        """
+        Async checkout; starting and quitting Chrome happen in a worker thread.
+
+        A driver the thread checks out after the caller was cancelled goes
+        straight back to the pool. A driver whose scrape was cancelled may
+        still be in use by an orphaned `to_thread` call, so it is quit (and
+        replaced on a later checkout) instead of being reused.
+        """
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.acquire, timeout))
+        try:
+            driver = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            acquiring.add_done_callback(self._release_abandoned)
+            raise
+        broken = False
+        try:
+            yield driver
+        except (WebDriverException, asyncio.CancelledError):
+            broken = True
+            raise
+        finally:
+            await asyncio.to_thread(self.release, driver, broken)
+
+    def _release_abandoned(self, acquiring):
+        if acquiring.cancelled() or acquiring.exception() is not None:
+            return
+        threading.Thread(target=self.release, args=(acquiring.result(),), daemon=True).start()
+
+    def close(self):
+        """Quit every idle driver; checked-out ones are quit when returned."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self.max_uses = 0
+        for driver in idle:
+            self._discard(driver)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, login=None, **kwargs):
+    """The process-wide pool called `name`, created with `login` on first use."""
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = BrowserPool(name, login=login, **kwargs)
+        return _pools[name]
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
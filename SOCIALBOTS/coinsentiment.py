@@ -0,0 +1,133 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+# Half-lives (seconds) tracked for every coin; reads pick one of them
+SENTIMENT_HALF_LIVES = tuple(int(h) for h in os.getenv("SENTIMENT_HALF_LIVES", "900,3600,86400").split(","))
+SENTIMENT_HALF_LIFE = int(os.getenv("SENTIMENT_HALF_LIFE", "3600"))  # used by coin_sentiment
+SEEN_KEYS = 200000  # (coin, post) pairs remembered so re-served posts are counted once
+SENTIMENT_STATE_PATH = os.getenv("SENTIMENT_STATE_PATH", "sentiment_state.json")
+
+logger = logging.getLogger(__name__)
+
+
+class CoinSentiment:
+    """
+    Running engagement-weighted sentiment per coin with exponential time decay.
+
+    For each half-life a coin keeps a decayed sum of sentiment * weight and
+    of weight, both as of the coin's latest post. Adding a post decays them
+    to the newer of the two times and adds it in: O(1) per half-life. The
+    average is their ratio, which decay leaves unchanged, so reading it is
+    a lookup; `activity` decays the weight to `now` for a recency measure.
+
+    The aggregates and seen post keys are persisted to a JSON file, so the
+    decay carries over between runs of the one-cycle-per-process scanner.
+    """
+    def __init__(self, half_lives=SENTIMENT_HALF_LIVES, path=SENTIMENT_STATE_PATH):
+        self.half_lives = tuple(half_lives)
+        self.path = path
+        self._coins = {}  # coin -> [last_ts, [weighted sums], [weights]]
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                self._load(path)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning("Ignoring unreadable sentiment state %s: %s", path, e, extra={"stage": "sentiment"})
+                self._coins, self._seen = {}, OrderedDict()
+
+    def _load(self, path):
+        with open(path, "r") as f:
+            state = json.load(f)
+        if tuple(state["half_lives"]) != self.half_lives:
+            logger.info("Sentiment state %s has other half-lives; starting over.", path, extra={"stage": "sentiment"})
+            return
+        self._coins = {coin: [s[0], list(s[1]), list(s[2])] for coin, s in state["coins"].items()}
+        self._seen = OrderedDict(((coin, bytes.fromhex(key)), None) for coin, key in state["seen"])
+
+    def save(self):
+        """Write the aggregates and seen keys to `path` (atomically)."""
+        if not self.path:
+            return
+        with self._lock:
+            state = {
+                "half_lives": list(self.half_lives),
+                "coins": {coin: [s[0], list(s[1]), list(s[2])] for coin, s in self._coins.items()},
+                "seen": [[coin, key.hex()] for coin, key in self._seen if isinstance(key, bytes)],
+            }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def _index(self, half_life):
+        try:
+            return self.half_lives.index(half_life)
+        except ValueError:
+            raise ValueError(f"Half-life {half_life}s is not tracked; have {self.half_lives}")
+
+    def add(self, coin, sentiment, weight, ts, key=None):
+        """
+        Fold one post into `coin`'s aggregates. Posts with a `key` already
+        added for this coin are ignored. Returns True if the post was added.
+        """
+        with self._lock:
+            if key is not None:
+                seen = (coin, key)
+                if seen in self._seen:
+                    self._seen.move_to_end(seen)
+                    return False
+                self._seen[seen] = None
+                if len(self._seen) > SEEN_KEYS:
+                    self._seen.popitem(last=False)
+
+            state = self._coins.get(coin)
+            if state is None:
+                state = self._coins[coin] = [ts, [0.0] * len(self.half_lives), [0.0] * len(self.half_lives)]
+            last_ts, sums, weights = state
+            for i, half_life in enumerate(self.half_lives):
+                if ts >= last_ts:
+                    decay = 0.5 ** ((ts - last_ts) / half_life)
+                    sums[i] = sums[i] * decay + sentiment * weight
+                    weights[i] = weights[i] * decay + weight
+                else:
+                    # Late arrival: discount it to the coin's current time instead
+                    late = weight * 0.5 ** ((last_ts - ts) / half_life)
+                    sums[i] += sentiment * late
+                    weights[i] += late
+            state[0] = max(last_ts, ts)
+            return True
+
+    def sentiment(self, coin, half_life=SENTIMENT_HALF_LIFE):
+        """Decayed weighted average sentiment of `coin`, or 0 with no weighted posts."""
+        state = self._coins.get(coin)
+        if state is None:
+            return 0
+        i = self._index(half_life)
+        return state[1][i] / state[2][i] if state[2][i] else 0
+
+    def activity(self, coin, now, half_life=SENTIMENT_HALF_LIFE):
+        """Total post weight for `coin` decayed to `now`."""
+        state = self._coins.get(coin)
+        if state is None:
+            return 0.0
+        return state[2][self._index(half_life)] * 0.5 ** (max(0.0, now - state[0]) / half_life)
+
+    def coins(self):
+        return list(self._coins)
+
+
+_default_aggregates = None
+_default_lock = threading.Lock()
+
+
+def get_coin_sentiment():
+    """Return the process-wide CoinSentiment, loaded from SENTIMENT_STATE_PATH."""
+    global _default_aggregates
+    with _default_lock:
+        if _default_aggregates is None:
+            _default_aggregates = CoinSentiment()
+        return _default_aggregates
@@ -0,0 +1,142 @@
+import os
+import re
+import zlib
+import hashlib
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.6"))  # estimated Jaccard similarity
+
+WORD_RE = re.compile(r"[^\W_]+")
+URL_RE = re.compile(r"https?://\S+|www\.\S+")
+
+
+def normalize(text):
+    """Lowercase words only; links, punctuation and emoji differ between copies of spam."""
+    return " ".join(WORD_RE.findall(URL_RE.sub(" ", str(text or "")).lower()))
+
+
+def shingles(words, size):
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class DuplicateCollapser:
+    """
+    Groups copy-pasted and lightly edited posts.
+
+    Identical texts (after `normalize`) are grouped by hash. Remaining texts
+    get a MinHash signature over word shingles; LSH banding finds candidate
+    pairs in a single pass, and a pair is merged when its estimated Jaccard
+    similarity reaches `threshold`. Each group is collapsed into its most
+    engaged post carrying the group's total engagement and duplicate count.
+
+    An optional partition key (e.g. the set of coins a post mentions) keeps
+    posts with different keys apart however similar their texts are, so
+    "$PEPE to the moon" and "$DOGE to the moon" stay two posts.
+    """
+    def __init__(self, threshold=DUPLICATE_THRESHOLD, num_perm=64, bands=16, shingle_size=2, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash family on 32-bit shingle hashes (uint64 arithmetic wraps)
+        self._a = rng.integers(1, 2**63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        words = normalize(text).split()
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles(words, self.shingle_size)), dtype=np.uint64
+        )
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)).min(axis=1)
+
+    def clusters(self, texts, keys=None):
+        """
+        Lists of indices into `texts`, one per group, in order of first
+        appearance. `keys[i]` is text i's partition key; only texts with
+        equal keys are grouped.
+        """
+        keys = keys if keys is not None else [None] * len(texts)
+        parent = list(range(len(texts)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i, j):
+            i, j = find(i), find(j)
+            if i != j:
+                parent[max(i, j)] = min(i, j)
+
+        # Exact copies
+        first_by_digest = {}
+        representatives = []
+        for i, text in enumerate(texts):
+            norm = normalize(text)
+            if not norm:
+                continue  # Nothing to compare; the post stays on its own
+            digest = (keys[i], hashlib.blake2b(norm.encode("utf-8"), digest_size=16).digest())
+            if digest in first_by_digest:
+                union(first_by_digest[digest], i)
+            else:
+                first_by_digest[digest] = i
+                representatives.append(i)
+
+        # Near copies, among one representative per exact group
+        signatures = {}
+        buckets = {}
+        for i in representatives:
+            sig = signatures[i] = self.signature(texts[i])
+            for band in range(self.bands):
+                key = (keys[i], band, sig[band * self.rows:(band + 1) * self.rows].tobytes())
+                for j in buckets.setdefault(key, []):
+                    if find(i) != find(j) and np.mean(sig == signatures[j]) >= self.threshold:
+                        union(i, j)
+                buckets[key].append(i)
+
+        groups = {}
+        for i in range(len(texts)):
+            groups.setdefault(find(i), []).append(i)
+        return list(groups.values())
+
+    def collapse(self, posts, text, key=None):
+        """
+        One post per group: a copy of the most engaged member with
+        `engagement_score` summed over the group and `duplicate_count` set
+        to the number of other copies. `key(post)`, if given, partitions the
+        posts before grouping.
+        """
+        collapsed = []
+        texts = [text(post) for post in posts]
+        keys = [key(post) for post in posts] if key is not None else None
+        for group in self.clusters(texts, keys):
+            members = [posts[i] for i in group]
+            canonical = dict(max(members, key=lambda p: p.get("engagement_score", 0) or 0))
+            canonical["engagement_score"] = sum(p.get("engagement_score", 0) or 0 for p in members)
+            canonical["duplicate_count"] = len(members) - 1
+            collapsed.append(canonical)
+        logger.debug("Collapsed %d posts into %d distinct posts.", len(posts), len(collapsed), extra={"stage": "dedupe"})
+        return collapsed
+
+
+_default_collapser = None
+
+
+def collapse_duplicates(posts, text, key=None):
+    """
+    Collapse `posts` with a shared DuplicateCollapser; `text(post)` gives the
+    text to compare and `key(post)` an optional partition (see `clusters`).
+    """
+    global _default_collapser
+    if _default_collapser is None:
+        _default_collapser = DuplicateCollapser()
+    return _default_collapser.collapse(posts, text, key)
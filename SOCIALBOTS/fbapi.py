@@ -1,13 +1,23 @@
 import asyncio
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException
+import re
+import os
 import json
 import time
 import random
+import hashlib
+import logging
+from .keywordmatcher import KeywordMatcher
+from .browserpool import get_pool
+from logsetup import sampled
+
+logger = logging.getLogger(__name__)
+
+FB_TARGET_POSTS = int(os.getenv("FB_TARGET_POSTS", "50"))
+FB_TIME_BUDGET = float(os.getenv("FB_TIME_BUDGET", "90"))  # seconds per scrape
 
 def calculate_engagement_score(likes, comments, shares, reactions):
     """Calculate engagement score based on weights."""
@@ -38,170 +48,204 @@ def dismiss_notification_prompt(driver):
         WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, "button[aria-label='Close']")))
         close_button = driver.find_element(By.CSS_SELECTOR, "button[aria-label='Close']")
         close_button.click()
-        print("Notification prompt dismissed.")
+        logger.debug("Notification prompt dismissed.")
     except TimeoutException:
-        print("No notification prompt found.")
+        logger.debug("No notification prompt found.")
 
 def wait_for_page_load(driver):
     """Wait for the document.readyState to be 'complete'."""
     WebDriverWait(driver, 60).until(
         lambda d: d.execute_script("return document.readyState") == "complete"
     )
-    print("Page loaded completely.")
-
-def is_placeholder(element):
-    """Check if the element is a loading placeholder."""
+    logger.debug("Page loaded completely.")
+
+# Unseen, fully loaded feed units since the last call, marked as seen in the
+# page so later scrolls skip them; optionally scrolls to the bottom afterwards.
+EXTRACT_NEW_POSTS_JS = """
+var seen = 'data-crtbot-seen';
+var units = document.querySelectorAll("div[data-pagelet^='FeedUnit']");
+if (!units.length) {
+    units = document.querySelectorAll("div[role='article']");
+}
+var posts = [];
+units.forEach(function (el) {
+    if (el.hasAttribute(seen)) return;
+    var label = el.getAttribute('aria-label') || '';
+    var state = el.getAttribute('data-visualcompletion') || '';
+    if (label.indexOf('loading') >= 0 || state.indexOf('loading-state') >= 0) return;  // Retry once loaded
+    el.setAttribute(seen, '1');
+    function text(selector, root) {
+        var node = (root || el).querySelector(selector);
+        return node ? node.innerText : null;
+    }
+    var link = el.querySelector("a[href*='/posts/'], a[href*='/permalink/'], a[href*='story_fbid=']");
+    var reactions = el.querySelector('div.x1n2onr6');
+    posts.push({
+        link: link ? link.href : null,
+        message: text("div[dir='auto']"),
+        likes: text('span.x1e558r4'),
+        reactions: reactions ? text('span.x1e558r4', reactions) : null,
+        comments: text("span[aria-label*='comment']"),
+        shares: text("span[aria-label*='share']")
+    });
+});
+if (arguments[0]) {
+    window.scrollTo(0, document.body.scrollHeight);
+}
+return {posts: posts, height: document.body.scrollHeight};
+"""
+
+POST_ID_RE = re.compile(r"(?:/posts/|/permalink/|story_fbid=)(\w+)")
+
+def parse_count(text):
+    """'1,234', '1.2K' or '3M' as an int (0 if missing or unreadable)."""
+    if not text:
+        return 0
+    text = text.strip().replace(',', '')
+    multiplier = 1
+    if text[-1:] in ('K', 'M'):
+        multiplier = 1000 if text[-1] == 'K' else 1000000
+        text = text[:-1]
     try:
-        if "loading" in element.get_attribute("aria-label") or "loading-state" in element.get_attribute("data-visualcompletion"):
-            return True
-        return False
-    except Exception:
-        return False
-
-async def scrape_group_or_page(driver, group_id, keywords):
-    """Scrape posts from a specific group or page URL for keywords and engagement metrics."""
+        return int(float(text) * multiplier)
+    except ValueError:
+        return 0
+
+def post_id(raw):
+    """Stable id for a feed unit: its permalink id, else a hash of the text."""
+    match = POST_ID_RE.search(raw.get('link') or '')
+    if match:
+        return match.group(1)
+    return hashlib.sha1(raw['message'].encode('utf-8')).hexdigest()
+
+async def scrape_group_or_page(driver, group_id, keywords, target_posts=FB_TARGET_POSTS,
+                               time_budget=FB_TIME_BUDGET, max_scroll_attempts=10, scroll_wait=7):
+    """
+    Scrape posts from a specific group or page URL for keywords and engagement metrics.
+
+    Each scroll runs one JS evaluation that returns only feed units not seen
+    before. Stops once `target_posts` matching posts are collected,
+    `time_budget` seconds have passed, or scrolling loads nothing new.
+    Driver calls run in a worker thread to keep the event loop free.
+    """
     url = f"https://www.facebook.com/groups/{group_id}"
+    matcher = KeywordMatcher(keywords)
+    started = time.monotonic()
 
     for attempt in range(3):
         try:
-            print(f"Attempting to load: {url}")
-            driver.get(url)
-            print(f"Current URL after load: {driver.current_url}")
-            wait_for_page_load(driver)
-            print("Page loaded successfully.")
+            logger.debug("Attempting to load: %s", url, extra={"source": "Facebook", "stage": "load"})
+            await asyncio.to_thread(driver.get, url)
+            await asyncio.to_thread(wait_for_page_load, driver)
             break
         except TimeoutException:
-            print(f"Retrying page load ({attempt + 1}/3)...")
+            logger.info("Retrying page load (%d/3)...", attempt + 1, extra={"source": "Facebook", "stage": "load"})
     else:
-        print("Failed to load the page after retries.")
+        logger.error("Failed to load the page after retries.", extra={"source": "Facebook", "stage": "load"})
         return []
 
-    # Scroll and collect posts
     posts = []
+    seen_ids = set()
     scroll_attempts = 0
-    max_scroll_attempts = 10  # Adjust this limit as needed
-    last_height = driver.execute_script("return document.body.scrollHeight")
-
-    while scroll_attempts < max_scroll_attempts:
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        await asyncio.sleep(random.uniform(5, 7))  # Random delay to mimic human behavior
-
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            print("No new content loaded, stopping scroll.")
+    last_height = None
+
+    while True:
+        out_of_time = time.monotonic() - started >= time_budget
+        scroll = scroll_attempts < max_scroll_attempts and not out_of_time
+        result = await asyncio.to_thread(driver.execute_script, EXTRACT_NEW_POSTS_JS, scroll)
+
+        for raw in result['posts']:
+            if not raw.get('message'):
+                continue
+            pid = post_id(raw)
+            if pid in seen_ids:
+                continue
+            seen_ids.add(pid)
+            if not matcher.search(raw['message']):
+                continue
+            logger.debug("Matched post %s", pid, extra=sampled(source="Facebook", stage="scrape"))
+            likes = parse_count(raw.get('likes'))
+            reactions = parse_count(raw.get('reactions')) or likes  # Fallback to likes if reactions missing
+            comments = parse_count(raw.get('comments'))
+            shares = parse_count(raw.get('shares'))
+            posts.append({
+                "post_id": pid,
+                "message": raw['message'],
+                "likes": likes,
+                "comments": comments,
+                "shares": shares,
+                "reactions": reactions,
+                "engagement_score": calculate_engagement_score(likes, comments, shares, reactions)
+            })
+
+        if len(posts) >= target_posts:
+            logger.info("Collected %d posts, stopping.", len(posts),
+                        extra={"source": "Facebook", "stage": "scrape", "latency": time.monotonic() - started})
+            return posts[:target_posts]
+        if not scroll:
             break
-
-        last_height = new_height
-        print(f"Scroll attempt {scroll_attempts + 1}")
-
-        elements = driver.find_elements(By.CSS_SELECTOR, "div[data-pagelet^='FeedUnit']")
-        #print(f"Found {len(elements)} posts in this scroll attempt.")
-
-        if len(elements) == 0:
-            print("No posts detected using primary selector. Checking alternative selectors.")
-            elements = driver.find_elements(By.CSS_SELECTOR, "div[role='article']")  # Alternative selector
-            #print(f"Found {len(elements)} posts using alternative selector.")
-
-        for element in elements:
-            try:
-                if is_placeholder(element):
-                    print("Skipping loading placeholder.")
-                    continue
-
-                message = element.find_element(By.CSS_SELECTOR, "div[dir='auto']").text.lower()
-
-                try:
-                    likes_text = element.find_element(By.CSS_SELECTOR, "span.x1e558r4").text.replace('K', '000').replace(',', '')
-                    likes = int(likes_text) if likes_text.isdigit() else 0
-                except NoSuchElementException:
-                    likes = 0
-
-                try:
-                    reactions_div = element.find_element(By.CSS_SELECTOR, "div.x1n2onr6")
-                    reactions_text = reactions_div.find_element(By.CSS_SELECTOR, "span.x1e558r4").text.replace('K', '000').replace(',', '')
-                    reactions = int(reactions_text) if reactions_text.isdigit() else likes  # Fallback to likes if reactions missing
-                except NoSuchElementException:
-                    reactions = likes
-
-                try:
-                    comments_text = element.find_element(By.CSS_SELECTOR, "span[aria-label*='comment']").text.replace('K', '000').replace(',', '')
-                    comments = int(comments_text) if comments_text.isdigit() else 0
-                except NoSuchElementException:
-                    comments = 0
-
-                try:
-                    shares_text = element.find_element(By.CSS_SELECTOR, "span[aria-label*='share']").text.replace('K', '000').replace(',', '')
-                    shares = int(shares_text) if shares_text.isdigit() else 0
-                except NoSuchElementException:
-                    shares = 0
-
-                engagement_score = calculate_engagement_score(likes, comments, shares, reactions)
-
-                if any(keyword.lower() in message for keyword in keywords):
-                    posts.append({
-                        "message": message,
-                        "likes": likes,
-                        "comments": comments,
-                        "shares": shares,
-                        "reactions": reactions,
-                        "engagement_score": engagement_score
-                    })
-
-            except NoSuchElementException:
-                continue  # Skip elements that do not match the expected structure
-
+        if result['height'] == last_height:
+            logger.debug("No new content loaded, stopping scroll.", extra={"source": "Facebook", "stage": "scrape"})
+            break
+        last_height = result['height']
         scroll_attempts += 1
+        logger.debug("Scroll attempt %d", scroll_attempts, extra={"source": "Facebook", "stage": "scrape"})
+
+        # Wait only until the feed grows, not a fixed 5-7 s
+        deadline = min(time.monotonic() + scroll_wait, started + time_budget)
+        while time.monotonic() < deadline:
+            await asyncio.sleep(random.uniform(0.5, 1.0))
+            height = await asyncio.to_thread(driver.execute_script, "return document.body.scrollHeight")
+            if height != last_height:
+                break
 
+    logger.info("Collected %d posts.", len(posts),
+                extra={"source": "Facebook", "stage": "scrape", "latency": time.monotonic() - started})
     return posts
 
-async def search_posts(group_id, keywords, cookies_file):
-    """Search posts for keywords using Selenium."""
-    service = Service("C:/chromedriver-win64/chromedriver.exe")  # Update with your ChromeDriver path
-    options = webdriver.ChromeOptions()
-    #options.add_argument("--headless")  
-    options.add_argument("--start-maximized")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--remote-debugging-port=9222")
+def login_with_cookies(driver, cookies_file):
+    """Log a fresh browser in with saved cookies; runs once per pooled browser."""
+    driver.get("https://www.facebook.com/")
+    load_cookies(driver, cookies_file)
 
-    driver = webdriver.Chrome(service=service, options=options)
+    # Refresh to apply cookies with retry logic
+    for attempt in range(3):
+        try:
+            driver.refresh()
+            logger.debug("Page refreshed successfully.")
+            break
+        except TimeoutException:
+            logger.info("Retrying refresh (%d/3)...", attempt + 1)
+            time.sleep(5)
+    else:
+        raise RuntimeError("Failed to refresh after retries.")
 
-    try:
-        driver.get("https://www.facebook.com/")
-        load_cookies(driver, cookies_file)
-
-        # Refresh to apply cookies with retry logic
-        for attempt in range(3):
-            try:
-                driver.refresh()
-                print("Page refreshed successfully.")
-                break
-            except TimeoutException:
-                print(f"Retrying refresh ({attempt + 1}/3)...")
-                await asyncio.sleep(5)
-        else:
-            print("Failed to refresh after retries.")
-            return []
-
-        await asyncio.sleep(10)  # Allow time for cookies to take effect
-
-        # Check login status with retries
-        for attempt in range(3):
-            if is_logged_in(driver):
-                break
-            print(f"Retrying login check ({attempt + 1}/3)...")
-            await asyncio.sleep(5)
-        else:
-            print("Failed to log in after retries. Please check your cookies.")
-            return []
+    time.sleep(10)  # Allow time for cookies to take effect
 
-        dismiss_notification_prompt(driver)
-        wait_for_page_load(driver)
+    # Check login status with retries
+    for attempt in range(3):
+        if is_logged_in(driver):
+            break
+        logger.info("Retrying login check (%d/3)...", attempt + 1)
+        time.sleep(5)
+    else:
+        raise RuntimeError("Failed to log in after retries. Please check your cookies.")
+
+    dismiss_notification_prompt(driver)
+    wait_for_page_load(driver)
 
-        posts = await scrape_group_or_page(driver, group_id, keywords)
-        return posts
+def fb_pool(cookies_file):
+    """Shared pool of logged-in Facebook drivers; the first caller's cookies log in every new browser."""
+    return get_pool("Facebook", login=lambda driver: login_with_cookies(driver, cookies_file))
 
-    finally:
-        driver.quit()
+async def search_posts(group_id, keywords, cookies_file, **scrape_kwargs):
+    """Search posts for keywords using a pooled, already logged-in browser."""
+    try:
+        async with fb_pool(cookies_file).session() as driver:
+            return await scrape_group_or_page(driver, group_id, keywords, **scrape_kwargs)
+    except RuntimeError as e:
+        logger.error("%s", e, extra={"source": "Facebook"})
+        return []
 
 if __name__ == "__main__":
     async def fbposts():
@@ -0,0 +1,90 @@
+import re
+
+# Words are runs of letters/digits; a leading $ or # marks a cashtag/hashtag.
+TOKEN_RE = re.compile(r"[$#]?[^\W_]+")
+
+ANY_CASE = "any"       # keywords, coin names and most tickers
+TICKER = "ticker"      # "ONE" as written in capitals, or $one / #one in any case
+
+# Tickers that are also everyday English words; only these need capitals or a
+# $/# prefix, so "btc" and "eth" still count but "one more pump" does not.
+COMMON_WORD_TICKERS = frozenset({
+    "ONE", "SAND", "NEAR", "GAS", "FLOW", "ATOM", "LINK", "DOT", "UNI", "SUN",
+    "CAKE", "GALA", "MASK", "ROSE", "HOT", "KEY", "RAY", "RUNE", "SAFE", "TON",
+    "WIN", "APE", "ANT", "BAT", "ACE", "ID", "OP", "OM", "ARK", "BOND", "POND",
+    "JOE", "MEME", "PEOPLE", "TRUMP", "MOVE", "DOG", "CAT", "BOME", "NOT", "ME",
+    "FUN", "GOAT", "AI", "SUPER", "MAGIC", "BLUR", "PRIME", "TRAC", "ALL", "USD",
+})
+
+
+class KeywordMatcher:
+    """
+    Compiled multi-pattern matcher on word boundaries.
+
+    Patterns are indexed by their first word, so a text is tokenized once
+    and every match is found in a single pass whatever the number of
+    patterns (1000 tickers cost one dict lookup per word). Multi-word
+    patterns such as "buy now" match consecutive words; "one" never matches
+    inside "someone".
+
+    Tickers match in any case ("btc", "BTC", "$btc"), except the ones in
+    COMMON_WORD_TICKERS: those count only in capitals or as a
+    cashtag/hashtag, so "ONE", "$one" and "#ONE" count but "one more pump"
+    does not.
+    """
+    def __init__(self, keywords=()):
+        self._index = {}  # first word (lowercase) -> [(words, exact words, label, mode)]
+        for keyword in keywords:
+            self.add(keyword)
+
+    def add(self, pattern, label=None, mode=ANY_CASE):
+        words = [token.lstrip("$#") for token in TOKEN_RE.findall(pattern)]
+        if not words:
+            return self
+        entry = (tuple(w.lower() for w in words), tuple(words), label or pattern, mode)
+        candidates = self._index.setdefault(entry[0][0], [])
+        if entry not in candidates:
+            candidates.append(entry)
+        return self
+
+    def add_coin(self, symbol, names=()):
+        """Index a ticker and optional coin names, all reported as `symbol`."""
+        symbol = symbol.upper()
+        self.add(symbol, label=symbol, mode=TICKER if symbol in COMMON_WORD_TICKERS else ANY_CASE)
+        for name in names:
+            self.add(name, label=symbol)
+        return self
+
+    def finditer(self, text):
+        """Yield the label of every match in `text`, in order of appearance."""
+        if not text:
+            return
+        tokens = TOKEN_RE.findall(text)
+        lowered = [token.lstrip("$#").lower() for token in tokens]
+        for i, word in enumerate(lowered):
+            for words, exact, label, mode in self._index.get(word, ()):
+                n = len(words)
+                if tuple(lowered[i:i + n]) != words:
+                    continue
+                if mode == TICKER and not (tokens[i][0] in "$#" or tokens[i] == exact[0]):
+                    continue
+                yield label
+
+    def matches(self, text):
+        return list(self.finditer(text))
+
+    def labels(self, text):
+        """Distinct labels found in `text`."""
+        return set(self.finditer(text))
+
+    def search(self, text):
+        """True if any pattern occurs in `text`."""
+        return next(self.finditer(text), None) is not None
+
+
+def coin_matcher(coins, names=None):
+    """KeywordMatcher over coin tickers; `names` maps a ticker to extra names."""
+    matcher = KeywordMatcher()
+    for coin in coins:
+        matcher.add_coin(coin, (names or {}).get(coin, ()))
+    return matcher
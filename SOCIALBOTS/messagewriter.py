@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+INSERT_MESSAGE = (
+    "INSERT INTO messages (group_id, message_id, group_name, sender_id, message, date, keyword_matches, engagement_score) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+_STOP = object()
+
+
+class MessageWriter:
+    """
+    Write-behind queue for the messages table.
+
+    One long-lived WAL connection inserts queued rows with `executemany`,
+    one commit per batch. A batch is written once it reaches `batch_size`
+    rows or `flush_interval` seconds after its first row. `put` waits while
+    `max_queue` rows are pending, so a burst slows the producer down instead
+    of growing memory without bound. `close` writes everything still queued.
+    """
+    def __init__(self, db_path, batch_size=200, flush_interval=1.0, max_queue=10000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._db = None
+        self._task = None
+        self.written = 0
+
+    async def start(self):
+        if self._task is None:
+            self._db = await aiosqlite.connect(self.db_path)
+            await self._db.execute("PRAGMA journal_mode=WAL")
+            await self._db.execute("PRAGMA synchronous=NORMAL")
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def put(self, post):
+        """Queue one processed message; blocks while the queue is full."""
+        await self._queue.put((
+            post["group_id"], post.get("message_id"), post["group_name"], post["sender_id"], post["message"], post["date"],
+            post.get("keyword_matches"), post.get("engagement_score")
+        ))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._write(batch)
+
+    async def _write(self, batch):
+        try:
+            await self._db.executemany(INSERT_MESSAGE, batch)
+            await self._db.commit()
+            self.written += len(batch)
+            logger.debug(f"Saved {len(batch)} messages to database.")
+        except Exception as e:
+            logger.error(f"Failed to save {len(batch)} messages: {e}")
+
+    async def close(self):
+        """Flush every queued row, then close the connection."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        await self._db.close()
+        self._task = None
+        self._db = None
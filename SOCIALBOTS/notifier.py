@@ -0,0 +1,173 @@
+import os
+import time
+import asyncio
+import logging
+from itertools import count
+from aiohttp import ClientSession, ClientError
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows about one message per second to a chat and 30 per second overall
+NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", "1.0"))            # messages per second per chat
+NOTIFY_BURST = int(os.getenv("NOTIFY_BURST", "3"))
+NOTIFY_GLOBAL_RATE = float(os.getenv("NOTIFY_GLOBAL_RATE", "25"))
+DIGEST_INTERVAL = float(os.getenv("DIGEST_INTERVAL", "60"))     # seconds between digests
+MAX_MESSAGE_LENGTH = 4096
+MAX_RETRIES = 3
+
+# Priorities: HIGH jumps the queue (trade fills, failures), NORMAL is sent in
+# order, LOW is held and sent as one digest per chat every DIGEST_INTERVAL.
+HIGH, NORMAL, LOW = 0, 1, 2
+
+
+def format_message(data):
+    if isinstance(data, dict):
+        return "\n".join(f"{key}: {value}" for key, value in data.items())
+    return str(data)
+
+
+def chunk_lines(lines, limit=MAX_MESSAGE_LENGTH):
+    """Join `lines` into as few messages under `limit` characters as possible."""
+    chunks, current = [], ""
+    pieces = (line[i:i + limit] for line in lines for i in range(0, max(len(line), 1), limit))
+    for line in pieces:
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class NotificationDispatcher:
+    """
+    Telegram bot messages over one persistent HTTP session.
+
+    Each chat has a priority queue drained by its own worker through a
+    per-chat token bucket (plus one shared bucket for the bot), so bursts
+    are paced instead of throttled. LOW messages are coalesced into a
+    digest per chat every `digest_interval` seconds. A 429 reply is retried
+    after the `retry_after` Telegram asks for.
+    """
+    def __init__(self, token, chat_id, rate=NOTIFY_RATE, burst=NOTIFY_BURST,
+                 global_rate=NOTIFY_GLOBAL_RATE, digest_interval=DIGEST_INTERVAL):
+        self.url = f"https://api.telegram.org/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.rate = rate
+        self.burst = burst
+        self.digest_interval = digest_interval
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}    # chat_id -> (queue, bucket, worker task)
+        self._digests = {}  # chat_id -> pending LOW messages
+        self._seq = count()  # keeps FIFO order within a priority
+        self._session = None
+        self._flusher = None
+        self.sent = 0
+
+    async def start(self):
+        if self._session is None:
+            self._session = ClientSession()
+            self._flusher = asyncio.create_task(self._flush_periodically())
+        return self
+
+    def notify(self, data, priority=NORMAL, chat_id=None):
+        """Queue a message without waiting for it to be sent."""
+        chat_id = chat_id or self.chat_id
+        text = format_message(data)
+        if priority == LOW:
+            self._digests.setdefault(chat_id, []).append(text)
+            return
+        for chunk in chunk_lines([text]):
+            self._chat(chat_id)[0].put_nowait((priority, next(self._seq), chunk))
+
+    def _chat(self, chat_id):
+        if chat_id not in self._chats:
+            queue = asyncio.PriorityQueue()
+            bucket = TokenBucket(self.rate, self.burst)
+            worker = asyncio.create_task(self._work(chat_id, queue, bucket))
+            self._chats[chat_id] = (queue, bucket, worker)
+        return self._chats[chat_id]
+
+    def flush_digests(self):
+        """Queue every pending digest now."""
+        for chat_id, lines in list(self._digests.items()):
+            if not lines:
+                continue
+            self._digests[chat_id] = []
+            header = f"Digest ({len(lines)} updates):"
+            for chunk in chunk_lines([header] + lines):
+                self._chat(chat_id)[0].put_nowait((NORMAL, next(self._seq), chunk))
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.digest_interval)
+            self.flush_digests()
+
+    async def _work(self, chat_id, queue, bucket):
+        while True:
+            _, _, text = await queue.get()
+            try:
+                await self._send(chat_id, text, bucket)
+            except Exception as e:
+                logger.error("Failed to send notification: %s", e, extra={"stage": "notify"})
+            finally:
+                queue.task_done()
+
+    async def _send(self, chat_id, text, bucket):
+        for attempt in range(MAX_RETRIES):
+            await bucket.acquire()
+            await self._global.acquire()
+            try:
+                async with self._session.post(self.url, data={"chat_id": chat_id, "text": text}) as response:
+                    if response.status == 200:
+                        self.sent += 1
+                        logger.debug("Notification sent.", extra={"stage": "notify"})
+                        return
+                    if response.status == 429:
+                        body = await response.json(content_type=None)
+                        retry_after = body.get("parameters", {}).get("retry_after", 1 + attempt)
+                        logger.warning("Notifications throttled; retrying in %ss", retry_after, extra={"stage": "notify"})
+                        await asyncio.sleep(retry_after)
+                        continue
+                    logger.error("Failed to send notification: %s", response.status, extra={"stage": "notify"})
+                    return
+            except ClientError as e:
+                logger.warning("Notification request failed (%d/%d): %s", attempt + 1, MAX_RETRIES, e, extra={"stage": "notify"})
+                await asyncio.sleep(1 + attempt)
+        logger.error("Giving up on a notification after retries.", extra={"stage": "notify"})
+
+    async def close(self):
+        """Send pending digests and queued messages, then close the session."""
+        if self._session is None:
+            return
+        self._flusher.cancel()
+        self.flush_digests()
+        for queue, _, _ in self._chats.values():
+            await queue.join()
+        for _, _, worker in self._chats.values():
+            worker.cancel()
+        await asyncio.gather(self._flusher, *(worker for _, _, worker in self._chats.values()),
+                             return_exceptions=True)
+        self._chats.clear()
+        await self._session.close()
+        self._session = None
@@ -1,15 +1,22 @@
 import os
+import json
+import time
 import logging
 import asyncio
+from collections import deque
 from datetime import datetime, timezone
 import asyncpraw
 import nest_asyncio
+from .keywordmatcher import KeywordMatcher
 
 # Apply nest_asyncio to prevent event loop conflicts
 nest_asyncio.apply()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REDDIT_CURSOR_PATH = os.getenv("REDDIT_CURSOR_PATH", "reddit_cursor.json")
+REDDIT_LOOKBACK = 24 * 3600  # seconds; matches the old time_filter="day" search
+REDDIT_BUFFER_SIZE = int(os.getenv("REDDIT_BUFFER_SIZE", "2000"))
 
 
 async def get_reddit_instance():
@@ -21,7 +28,7 @@ async def get_reddit_instance():
     user_agent = os.getenv("REDDIT_USER_AGENT")
 
     if not client_id or not client_secret or not user_agent:
-        logging.error("Reddit API credentials are not set in environment variables.")
+        logger.error("Reddit API credentials are not set in environment variables.")
         raise Exception("Reddit API credentials are missing.")
 
     reddit = asyncpraw.Reddit(
@@ -29,7 +36,7 @@ async def get_reddit_instance():
         client_secret=client_secret,
         user_agent=user_agent
     )
-    logging.info("Async Reddit instance created successfully.")
+    logger.info("Async Reddit instance created successfully.")
     return reddit
 
 
@@ -53,6 +60,27 @@ def calculate_engagement_score(post):
     return round(engagement_score, 2)
 
 
+def build_post(post):
+    """Post dict for a listing submission; uses only listing fields (no comment-tree fetch)."""
+    engagement_score = calculate_engagement_score({
+        "score": post.score,
+        "num_comments": post.num_comments,
+        "total_awards_received": post.total_awards_received,
+        "created_utc": post.created_utc
+    })
+    return {
+        "id": post.id,
+        "title": post.title,
+        "selftext": post.selftext,
+        "url": post.url,
+        "score": post.score,
+        "num_comments": post.num_comments,
+        "author": str(post.author),
+        "created_utc": post.created_utc,
+        "engagement_score": engagement_score,
+    }
+
+
 async def search_subreddits(keywords, subreddit_names, limit=50):
     """
     Search for crypto-related pump-and-dump activity using async PRAW.
@@ -67,7 +95,7 @@ async def search_subreddits(keywords, subreddit_names, limit=50):
             # Combine subreddits into a single query
             subreddit_query = "+".join(subreddit_names)
             subreddit = await reddit.subreddit(subreddit_query)
-            logging.info(f"Searching for pumps in subreddits: {subreddit_query}")
+            logger.info(f"Searching for pumps in subreddits: {subreddit_query}")
 
             # Perform the search
             search_results = subreddit.search(
@@ -76,53 +104,168 @@ async def search_subreddits(keywords, subreddit_names, limit=50):
                 sort="new",  # Prioritize new posts
                 time_filter="day"  # Posts from the last day
             )
-            logging.info(f"Search completed for keywords: '{keywords}'")
+            logger.info(f"Search completed for keywords: '{keywords}'")
 
             # Collect relevant results
             posts = []
             async for post in search_results:
-                engagement_score = calculate_engagement_score({
-                    "score": post.score,
-                    "num_comments": len(post.comments),
-                    "total_awards_received": post.total_awards_received,
-                    "created_utc": post.created_utc
-                })
-                posts.append({
-                    "title": post.title,
-                    "url": post.url,
-                    "score": post.score,
-                    "num_comments": len(post.comments),
-                    "author": str(post.author),
-                    "created_utc": post.created_utc,
-                    "engagement_score": engagement_score,
-                })
-
-            logging.info(f"Total posts retrieved: {len(posts)}")
+                posts.append(build_post(post))
+
+            logger.info(f"Total posts retrieved: {len(posts)}")
             return posts
 
         except Exception as e:
-            logging.exception("An error occurred while searching subreddits.")
+            logger.exception("An error occurred while searching subreddits.")
             return []
 
 
+class RedditFollower:
+    """
+    Follows subreddits through their /new listing from a persisted
+    `created_utc` cursor. Each poll pages back only as far as the cursor
+    (usually one request), keeps posts matching the keywords, and adds the
+    new ones to a bounded buffer that `snapshot` reads.
+    """
+    def __init__(self, subreddit_names, keywords, cursor_path=REDDIT_CURSOR_PATH, buffer_size=REDDIT_BUFFER_SIZE):
+        self.subreddit_query = "+".join(sorted(subreddit_names))
+        self.matcher = KeywordMatcher(keywords)
+        self.cursor_path = cursor_path
+        self.buffer = deque(maxlen=buffer_size)  # posts, oldest first
+        self.cursor = 0.0        # created_utc of the newest post seen
+        self.cursor_ids = []     # ids seen at exactly `cursor` (same-second posts)
+        self._reddit = None
+        self._primed = False     # buffer refilled since process start
+        self._load_cursor()
+
+    def _load_cursor(self):
+        if self.cursor_path and os.path.exists(self.cursor_path):
+            try:
+                with open(self.cursor_path, "r") as f:
+                    state = json.load(f).get(self.subreddit_query, {})
+                self.cursor = state.get("created_utc", 0.0)
+                self.cursor_ids = state.get("ids", [])
+            except ValueError as e:
+                logger.warning(f"Ignoring unreadable Reddit cursor {self.cursor_path}: {e}")
+
+    def _save_cursor(self):
+        if not self.cursor_path:
+            return
+        state = {}
+        if os.path.exists(self.cursor_path):
+            try:
+                with open(self.cursor_path, "r") as f:
+                    state = json.load(f)
+            except ValueError:
+                pass
+        state[self.subreddit_query] = {"created_utc": self.cursor, "ids": self.cursor_ids}
+        tmp = self.cursor_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.cursor_path)
+
+    def _is_new(self, post):
+        return post.created_utc > self.cursor or (
+            post.created_utc == self.cursor and post.id not in self.cursor_ids)
+
+    async def poll(self, limit=100):
+        """
+        Fetch posts created since the cursor, `limit` per page, following
+        the listing's `after` fullname until a post older than the cursor
+        (or the lookback window) shows up. Returns the new matching ones,
+        oldest first. The first poll of a process also refills the buffer
+        with the last day's posts, without returning them as new.
+        """
+        if self._reddit is None:
+            self._reddit = await get_reddit_instance()
+        subreddit = await self._reddit.subreddit(self.subreddit_query)
+        first_poll = not self._primed
+        oldest = time.time() - REDDIT_LOOKBACK
+        if not first_poll:
+            oldest = max(oldest, self.cursor)
+
+        fetched = []
+        after = None
+        reached = False
+        while not reached:
+            page = [post async for post in subreddit.new(limit=limit, params={"after": after} if after else {})]
+            for post in page:
+                if post.created_utc < oldest:
+                    reached = True  # Listing is newest first; everything after is older
+                    break
+                fetched.append(post)
+            if len(page) < limit:
+                break  # End of the listing (Reddit serves about 1000 posts)
+            after = page[-1].fullname
+        if not reached:
+            logger.warning("Reddit listing for %s ended before reaching the cursor; older posts were not read",
+                           self.subreddit_query, extra={"source": "Reddit", "stage": "poll"})
+        self._primed = True
+
+        fresh = [post for post in fetched if self._is_new(post)]
+        if fresh:
+            newest = max(post.created_utc for post in fresh)
+            self.cursor_ids = [post.id for post in fresh if post.created_utc == newest] + (
+                self.cursor_ids if newest == self.cursor else [])
+            self.cursor = newest
+            self._save_cursor()
+
+        fresh_ids = {post.id for post in fresh}
+        new_posts = []
+        for post in reversed(fetched if first_poll else fresh):
+            if not self.matcher.search(post.title + "\n" + (post.selftext or "")):
+                continue
+            item = build_post(post)
+            self.buffer.append(item)
+            if post.id in fresh_ids:
+                new_posts.append(item)
+        logger.info(f"Reddit: {len(new_posts)} new matching posts of {len(fresh)} new in {self.subreddit_query}")
+        return new_posts
+
+    def snapshot(self, since=None):
+        """Buffered posts created at or after `since` (UNIX seconds), oldest first."""
+        if since is None:
+            return list(self.buffer)
+        return [post for post in self.buffer if post["created_utc"] >= since]
+
+    async def close(self):
+        if self._reddit is not None:
+            await self._reddit.close()
+            self._reddit = None
+
+
+_followers = {}
+
+
 async def redditposts(keyword, subreddit_input, limit_input):
     """
-    Search for Reddit posts using keywords and return results with engagement scores.
+    Reddit posts matching the keywords from the last day, with engagement
+    scores. Each call polls only for posts newer than the stored cursor and
+    serves the rest from the follower's buffer.
 
-    :param keyword: The keyword to search for.
+    :param keyword: The keywords to match.
     :param subreddit_input: List of subreddit names.
-    :param limit_input: Limit on the number of posts to fetch.
+    :param limit_input: New posts read per listing page.
     :return: List of posts with details and engagement scores.
     """
     try:
         limit = int(limit_input)
     except ValueError:
-        logging.error("Invalid input for limit. Defaulting to 10.")
+        logger.error("Invalid input for limit. Defaulting to 10.")
         limit = 10
 
     subreddit_names = [s.strip() for s in subreddit_input]
-    results = await search_subreddits(keyword, subreddit_names, limit)
-    return results
+    key = ("+".join(sorted(subreddit_names)), tuple(sorted(keyword)))
+    follower = _followers.get(key)
+    if follower is None:
+        follower = _followers[key] = RedditFollower(subreddit_names, keyword)
+    await follower.poll(limit=max(limit, 100))
+    return follower.snapshot(since=time.time() - REDDIT_LOOKBACK)
+
+
+async def close_reddit_followers():
+    for follower in _followers.values():
+        await follower.close()
+    _followers.clear()
 
 
 async def main():
@@ -132,7 +275,8 @@ async def main():
         results = await redditposts(keywords, subreddits, 10)
         print(results)
     except Exception as e:
-        logging.error(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     asyncio.run(main())
\ No newline at end of file
@@ -2,12 +2,16 @@ import os
 import json
 import asyncio
 import logging
+from collections import deque
+from datetime import datetime
 from dotenv import load_dotenv
 from telethon import TelegramClient, events
 from telethon.errors.rpcerrorlist import UserAlreadyParticipantError
 from telethon.tl.functions.channels import JoinChannelRequest
-from aiohttp import ClientSession
 import aiosqlite
+from .messagewriter import MessageWriter
+from .notifier import NotificationDispatcher, NORMAL, LOW
+from .keywordmatcher import KeywordMatcher
 
 # Load environment variables
 load_dotenv()
@@ -24,8 +28,13 @@ CHAT_ID = os.getenv('CHAT_ID')
 # Database path
 DB_PATH = os.getenv('DB_PATH', '../db.sqlite3')
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Messages kept in memory by the ingestion service
+TELEGRAM_BUFFER_SIZE = int(os.getenv('TELEGRAM_BUFFER_SIZE', '5000'))
+
+# Batched message writes
+MESSAGE_BATCH_SIZE = int(os.getenv('MESSAGE_BATCH_SIZE', '200'))
+MESSAGE_FLUSH_INTERVAL = float(os.getenv('MESSAGE_FLUSH_INTERVAL', '1.0'))  # seconds
+
 logger = logging.getLogger(__name__)
 
 # Define group configuration directly
@@ -46,49 +55,68 @@ async def init_db():
             CREATE TABLE IF NOT EXISTS messages (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 group_id INTEGER,
+                message_id INTEGER,
                 group_name TEXT,
                 sender_id INTEGER,
                 message TEXT,
-                date TEXT
+                date TEXT,
+                keyword_matches INTEGER,
+                engagement_score REAL
             )
         ''')
+        # Databases created before the ingestion service lack the score and message id columns
+        async with db.execute("PRAGMA table_info(messages)") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        for column, column_type in (("keyword_matches", "INTEGER"), ("engagement_score", "REAL"), ("message_id", "INTEGER")):
+            if column not in columns:
+                await db.execute(f"ALTER TABLE messages ADD COLUMN {column} {column_type}")
         await db.commit()
 
 
-async def save_message(group_id, group_name, sender_id, message, date):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO messages (group_id, group_name, sender_id, message, date) VALUES (?, ?, ?, ?, ?)",
-            (group_id, group_name, sender_id, message, date)
-        )
-        await db.commit()
-        logger.debug(f"Message saved to database from group {group_name}.")
+_message_writer = None
+
+async def save_message(post):
+    """Queue `post` for the shared batched writer (started on first use)."""
+    global _message_writer
+    if _message_writer is None:
+        _message_writer = MessageWriter(DB_PATH, batch_size=MESSAGE_BATCH_SIZE, flush_interval=MESSAGE_FLUSH_INTERVAL)
+        await _message_writer.start()
+    await _message_writer.put(post)
+
+async def close_message_writer():
+    """Flush queued messages and close the writer's connection."""
+    global _message_writer
+    if _message_writer is not None:
+        await _message_writer.close()
+        _message_writer = None
 
 # Asynchronous notification system
-async def send_notification(data):
+_dispatcher = None
+
+async def get_dispatcher():
+    """The shared NotificationDispatcher for the notification bot (started on first use)."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = await NotificationDispatcher(BOT_TOKEN, CHAT_ID).start()
+    return _dispatcher
+
+async def send_notification(data, priority=NORMAL):
     """
-    Sends a notification to a specified Telegram chat.
+    Queues a notification for the configured Telegram chat; it is sent by
+    the rate-limited dispatcher, or folded into a digest when LOW.
     
     Parameters:
     - data (str or dict): The text or dictionary to send as a message.
+    - priority: notifier.HIGH, NORMAL or LOW.
     """
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    
-    if isinstance(data, dict):
-        # Format the dictionary into a readable string
-        formatted_text = "\n".join([f"{key}: {value}" for key, value in data.items()])
-    else:
-        # Use the string as-is
-        formatted_text = str(data)
-    
-    payload = {"chat_id": CHAT_ID, "text": formatted_text}
-    
-    async with ClientSession() as session:
-        async with session.post(url, data=payload) as response:
-            if response.status != 200:
-                logger.error(f"Failed to send notification: {response.status}")
-            else:
-                logger.info("Notification sent.")
+    (await get_dispatcher()).notify(data, priority)
+
+async def close_notifications():
+    """Send everything still queued (including digests) and close the session."""
+    global _dispatcher
+    if _dispatcher is not None:
+        await _dispatcher.close()
+        _dispatcher = None
 
 
 async def join_groups(client, group_keywords):
@@ -111,6 +139,7 @@ async def join_groups(client, group_keywords):
             group_name = group_entity.title
             group_keywords[group_id] = {
                 'keywords': keywords,
+                'matcher': KeywordMatcher(keywords),
                 'username': getattr(group_entity, 'username', None),
                 'title': group_name
             }
@@ -118,7 +147,46 @@ async def join_groups(client, group_keywords):
         except Exception as e:
             logger.error(f"Error joining group '{group_username}': {e}")
 
-async def process_history(client, group_id, group_info, limit=10):
+def engagement_score(keyword_matches, message_length, views=0, replies=0):
+    # Add weights as per your logic
+    return (
+        keyword_matches * 5  # Weight for keyword matches
+        + message_length * 0.01  # Weight for message length
+        + (views or 0) * 0.2  # Weight for views (if available)
+        + (replies or 0) * 0.5  # Weight for replies
+    )
+
+def build_post(group_id, group_info, message):
+    """Processed-message dict for a Telethon message, as stored in the ring buffer."""
+    message_text = message.text or message.raw_text
+    keyword_matches = len(group_info['matcher'].labels(message_text))
+    return {
+        "group_id": group_id,
+        "message_id": message.id,
+        "group_name": group_info['title'],
+        "sender_id": message.sender_id,
+        "message": message_text,
+        "date": message.date.isoformat(),
+        "keyword_matches": keyword_matches,
+        "engagement_score": engagement_score(
+            keyword_matches,
+            len(message_text),
+            message.views,
+            message.replies.replies if message.replies else 0
+        ),
+    }
+
+def _legacy_key(post):
+    """Key of rows stored before message ids were kept."""
+    return (post["group_id"], post["sender_id"], post["date"])
+
+def _post_key(post):
+    # Message ids are unique per group; same-second messages from one sender stay distinct
+    if post.get("message_id") is not None:
+        return (post["group_id"], post["message_id"])
+    return _legacy_key(post)
+
+async def process_history(client, group_id, group_info, limit=10, skip=None):
     """
     Process the history of messages in a given group and compute engagement scores.
 
@@ -126,111 +194,191 @@ async def process_history(client, group_id, group_info, limit=10):
     :param group_id: ID of the group to process
     :param group_info: Group metadata including keywords
     :param limit: Maximum number of messages to fetch
+    :param skip: Keys (see `_post_key`) of messages already stored; they are not saved or returned again
     :return: List of processed messages containing keywords with engagement scores
     """
     logger.info(f"Processing history for group: {group_info['title']}")
     processed_messages = []
+    skip = skip or set()
 
     async for message in client.iter_messages(group_id, limit=limit):
         if message.text:
-            message_text = message.text
-            sender_id = message.sender_id
-            date = message.date
-            message_length = len(message_text)
-
-            # Check if message contains any of the keywords
-            keywords = group_info['keywords']
-            keyword_matches = sum(1 for keyword in keywords if keyword.lower() in message_text.lower())
-
-            # Calculate engagement score
-            # Add weights as per your logic
-            engagement_score = (
-                keyword_matches * 5  # Weight for keyword matches
-                + message_length * 0.01  # Weight for message length
-                + (message.views or 0) * 0.2  # Weight for views (if available)
-                + (message.replies.replies if message.replies else 0) * 0.5  # Weight for replies
-            )
+            post = build_post(group_id, group_info, message)
+            if _post_key(post) in skip or _legacy_key(post) in skip:
+                continue
+            await save_message(post)
+            processed_messages.append(post)
+    return processed_messages
+
+
+class TelegramIngestor:
+    """
+    Resident Telegram ingestion: one connected client pushes every message
+    from the monitored groups into a bounded ring buffer (and the database).
+    `snapshot` is a cheap in-memory read the pipeline can call every cycle.
+    """
+    def __init__(self, buffer_size=TELEGRAM_BUFFER_SIZE, history_limit=100):
+        self.buffer = deque(maxlen=buffer_size)  # (timestamp, post), oldest first
+        self.history_limit = history_limit
+        self.client = None
+        self.group_keywords = {}
 
-            await save_message(group_id, group_info['title'], sender_id, message_text, date.isoformat())
-            notification_text = f"Keyword '{keywords}' found in {group_info['title']}:\n{message_text}"
-            #logger.info(notification_text)
+    @property
+    def connected(self):
+        return self.client is not None and self.client.is_connected()
 
-            # Add the message to the processed list
-            processed_messages.append({
+    def _push(self, post):
+        self.buffer.append((datetime.fromisoformat(post["date"]).timestamp(), post))
+
+    async def _warm_from_db(self):
+        """Refill the ring buffer from the newest stored messages after a restart."""
+        async with aiosqlite.connect(DB_PATH) as db:
+            async with db.execute(
+                "SELECT group_id, message_id, group_name, sender_id, message, date, keyword_matches, engagement_score "
+                "FROM messages ORDER BY id DESC LIMIT ?", (self.buffer.maxlen,)
+            ) as cursor:
+                rows = await cursor.fetchall()
+        for group_id, message_id, group_name, sender_id, message, date, keyword_matches, score in sorted(rows, key=lambda r: r[5]):
+            self._push({
                 "group_id": group_id,
-                "group_name": group_info['title'],
+                "message_id": message_id,
+                "group_name": group_name,
                 "sender_id": sender_id,
-                "message": message_text,
-                "date": date.isoformat(),
-                "keyword_matches": keyword_matches,
-                "engagement_score": engagement_score,
+                "message": message,
+                "date": date,
+                "keyword_matches": keyword_matches or 0,
+                "engagement_score": score if score is not None else engagement_score(keyword_matches or 0, len(message)),
             })
-    return processed_messages
 
+    async def start(self):
+        if self.client is not None:
+            return self
+        await init_db()
+        logger.info("Database initialized.")
 
+        logger.info("Starting Telegram client...")
+        self.client = TelegramClient(SESSION_NAME, API_ID, API_HASH)
+        try:
+            await self.client.start()
+            logger.info("Telegram client started.")
 
-async def TelegramPosts():
-    # Initialize database
-    await init_db()
-    logger.info("Database initialized.")
+            await join_groups(self.client, self.group_keywords)
+            await self._warm_from_db()
 
-    # Start client
-    logger.info("Starting Telegram client...")
-    client = TelegramClient(SESSION_NAME, API_ID, API_HASH)
-    await client.start()
-    logger.info("Telegram client started.")
+            logger.info("Processing message history...")
+            seen = {_post_key(post) for _, post in self.buffer}
+            history = []
+            for group_id, group_info in self.group_keywords.items():
+                history.extend(await process_history(self.client, group_id, group_info, limit=self.history_limit, skip=seen))
+            for post in sorted(history, key=lambda p: p["date"]):
+                self._push(post)
+            logger.info("Message history processed.")
+        except BaseException:
+            # Don't leak a connected client (or queued writes) when startup fails
+            await self.stop()
+            raise
 
-    # Build a mapping of chat_id to keywords and group info
-    group_keywords = {}
+        # Telethon dispatches updates in the background while the loop runs
+        self.client.add_event_handler(self._on_new_message, events.NewMessage)
+        logger.info("Listening for new messages...")
+        return self
 
-    # Join groups
-    logger.info("Joining groups...")
-    await join_groups(client, group_keywords)
-    logger.info("Groups joined.")
+    async def _on_new_message(self, event):
+        group_id = event.chat_id
+        if group_id not in self.group_keywords or not event.raw_text:
+            return
+        group_info = self.group_keywords[group_id]
+        post = build_post(group_id, group_info, event.message)
+        self._push(post)
+        await save_message(post)
 
-    logger.info("Processing message history...")
-    all_processed_messages = []  # To store all history messages from groups
-    for group_id, group_info in group_keywords.items():
-        processed_messages = await process_history(client, group_id, group_info, limit=100)
-        all_processed_messages.extend(processed_messages)
-    logger.info("Message history processed.")
+        matched = sorted(group_info['matcher'].labels(post["message"]))
+        if matched:
+            notification_text = f"Keyword '{', '.join(matched)}' found in {group_info['title']}:\n{post['message']}"
+            await send_notification(notification_text, priority=LOW)
+            logger.info(notification_text)
+
+    def snapshot(self, since=None):
+        """
+        Buffered posts, oldest first. `since` (datetime or UNIX seconds)
+        keeps only messages dated at or after it.
+        """
+        if since is None:
+            return [post for _, post in self.buffer]
+        if isinstance(since, datetime):
+            since = since.timestamp()
+        return [post for ts, post in self.buffer if ts >= since]
+
+    async def run_until_disconnected(self):
+        await self.client.run_until_disconnected()
+
+    async def stop(self):
+        if self.client is not None:
+            await self.client.disconnect()
+            self.client = None
+            logger.info("Client disconnected gracefully.")
+        await close_message_writer()
+
+
+_default_ingestor = None
 
-    # Register event handler
-    @client.on(events.NewMessage)
-    async def new_message_handler(event):
-        group_id = event.chat_id
-        if group_id in group_keywords:
-            message_text = event.raw_text
-            sender_id = event.sender_id
-            date = event.date
-            group_info = group_keywords[group_id]
-            group_name = group_info['title']
-            # Check if message contains any of the keywords
-            keywords = group_info['keywords']
-            for keyword in keywords:
-                if keyword.lower() in message_text.lower():
-                    await save_message(group_id, group_name, sender_id, message_text, date.isoformat())
-                    notification_text = f"Keyword '{keyword}' found in {group_name}:\n{message_text}"
-                    await send_notification(notification_text)
-                    logger.info(notification_text)
 
+async def start_telegram_ingestion(**kwargs):
+    """Start (once) the process-wide TelegramIngestor."""
+    global _default_ingestor
+    if _default_ingestor is None:
+        ingestor = TelegramIngestor(**kwargs)
+        await ingestor.start()
+        _default_ingestor = ingestor
+    return _default_ingestor
+
+async def stop_telegram_ingestion():
+    global _default_ingestor
+    if _default_ingestor is not None:
+        await _default_ingestor.stop()
+        _default_ingestor = None
+
+def get_telegram_ingestor():
+    return _default_ingestor
+
+
+async def TelegramPosts(listen=True, since=None):
+    """
+    Recent messages from the configured groups. Served from the resident
+    ingestor when it is running; otherwise a temporary one is started, and
+    with `listen` kept running for live notifications until it disconnects.
+    """
+    ingestor = get_telegram_ingestor()
+    if ingestor is not None and ingestor.connected:
+        return ingestor.snapshot(since)
+
+    ingestor = TelegramIngestor()
     try:
-        logger.info("Listening for new messages...")
-        await client.run_until_disconnected()
-    except (KeyboardInterrupt, asyncio.CancelledError):
+        await ingestor.start()
+        posts = ingestor.snapshot(since)
+        if listen:
+            await ingestor.run_until_disconnected()
+    except KeyboardInterrupt:
         logger.info("Received disconnect signal. Shutting down gracefully...")
+        posts = ingestor.snapshot(since)
+    except asyncio.CancelledError:
+        # Let collect_source and gather see the cancellation; cleanup runs below
+        logger.info("Telegram read cancelled. Shutting down gracefully...")
+        raise
     finally:
-        # Gracefully disconnect the client and allow pending tasks to cancel.
-        await client.disconnect()
-        # Give a short delay for tasks to cancel properly
-        await asyncio.sleep(0.5)
-        logger.info("Client disconnected gracefully.")
+        await ingestor.stop()
+    return posts
 
-    return all_processed_messages
+async def listen_and_notify():
+    try:
+        await TelegramPosts()
+    finally:
+        await close_notifications()
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     try:
-        asyncio.run(TelegramPosts())
+        asyncio.run(listen_and_notify())
     except KeyboardInterrupt:
         logger.info("User interrupted the script. Shutting down...")
     except Exception as e:
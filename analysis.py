@@ -1,31 +1,19 @@
 import time
-import nltk
 import statistics
-import requests
-nltk.download('vader_lexicon')
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from candlestore import get_store
+from asyncmarket import get_async_client
+from sentimentservice import get_sentiment_service
 
 def compute_sentiment_score(post_text):
-    sid = SentimentIntensityAnalyzer()
-    scores = sid.polarity_scores(post_text)
-    # VADER gives 'compound' in [-1,1]
-    # Transform it to [0,1] for convenience
-    sentiment = (scores['compound'] + 1) / 2.0  
+    # VADER 'compound' in [-1,1], transformed to [0,1] by the shared service
+    sentiment = get_sentiment_service().score(post_text)
     # If sentiment > 0.8, we consider it a strong indicator
     sentiment_score = 20 if sentiment > 0.8 else 0
     return sentiment_score, sentiment
 
 def get_historical_klines(symbol="BTCUSDT", interval="1h", limit=100):
-    """Fetch historical OHLC data from Binance."""
-    url = "https://api.binance.com/api/v3/klines"
-    params = {
-        "symbol": symbol,
-        "interval": interval,
-        "limit": limit
-    }
-    response = requests.get(url, params=params)
-    data = response.json()
-    return data
+    """Fetch historical OHLC data from the shared candle store."""
+    return get_store().get_klines(symbol=symbol, interval=interval, limit=limit)
 
 def analyze_historical_data(klines):
     """Analyze historical data to detect past pump patterns.
@@ -91,3 +79,9 @@ def assess_historical_pattern(coin_symbol="BTCUSDT"):
     
     return float(hist_score)
 
+async def assess_historical_pattern_async(coin_symbol="BTCUSDT"):
+    """Non-blocking `assess_historical_pattern` using the pooled async market client."""
+    klines_data = await get_async_client().get_klines(symbol=coin_symbol, interval="1h", limit=1000)
+    hist_score, details = analyze_historical_data(klines_data)
+
+    return float(hist_score)
@@ -0,0 +1,174 @@
+"""
+Non-blocking Binance market data client.
+
+All requests go through one aiohttp session with a keep-alive connection
+pool, so coins processed with `asyncio.gather` really run concurrently.
+Klines are still served from (and written to) the shared candle store, with
+its SQLite work done in worker threads; a range already being fetched is
+awaited by later callers instead of being fetched again. Tickers come from
+the WebSocket table or the shared 24hr snapshot.
+"""
+import os
+import asyncio
+import aiohttp
+from candlestore import (
+    get_store,
+    group_timestamps,
+    cover_spans,
+    resolve_closes,
+    INTERVAL_MS,
+    MAX_KLINES_PER_REQUEST
+)
+from marketdata import get_market_data, MARKET_DATA_MAX_AGE
+from tickersnapshot import get_snapshot
+
+BINANCE_REST_URL = os.getenv("BINANCE_REST_URL", "https://api.binance.com")
+MAX_CONNECTIONS = 20
+REQUEST_TIMEOUT = 15  # seconds
+
+
+class AsyncMarketClient:
+    def __init__(self, base_url: str = BINANCE_REST_URL, store=None, snapshot=None,
+                 max_connections: int = MAX_CONNECTIONS):
+        self.base_url = base_url.rstrip("/")
+        self.store = store or get_store()
+        self.snapshot = snapshot or get_snapshot()
+        self.max_connections = max_connections
+        self._session = None
+        self._snapshot_lock = None
+        self._inflight = {}  # (symbol, interval, range_start, range_end) -> task filling that range
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+            )
+            self._snapshot_lock = asyncio.Lock()
+        return self._session
+
+    async def _get_json(self, path: str, params: dict = None):
+        session = await self._get_session()
+        async with session.get(self.base_url + path, params=params) as response:
+            if response.status != 200:
+                raise ValueError(f"Failed to fetch {path}: {await response.text()}")
+            return await response.json()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    # ---- tickers ----
+
+    async def get_binance_data(self, symbol: str):
+        """Async `decision.get_binance_data`: (current_price, price_change_percent, volume)."""
+        stream = get_market_data()
+        if stream is not None and stream.connected:
+            ticker = stream.get_ticker(symbol, max_age=MARKET_DATA_MAX_AGE)
+            if ticker is not None:
+                return ticker
+
+        await self._get_session()
+        if self.snapshot.is_stale():
+            async with self._snapshot_lock:
+                if self.snapshot.is_stale():  # Only the first waiter refreshes
+                    self.snapshot.load(await self._get_json("/api/v3/ticker/24hr"))
+        return self.snapshot.get_ticker(symbol)
+
+    # ---- klines ----
+
+    async def _fetch_range(self, symbol, interval, start_ms, end_ms):
+        rows = []
+        while start_ms <= end_ms:
+            batch = await self._get_json("/api/v3/klines", {
+                "symbol": symbol,
+                "interval": interval,
+                "startTime": int(start_ms),
+                "endTime": int(end_ms),
+                "limit": MAX_KLINES_PER_REQUEST,
+            })
+            if not batch:
+                break
+            rows.extend(batch)
+            if len(batch) < MAX_KLINES_PER_REQUEST:
+                break
+            start_ms = batch[-1][0] + 1
+        return rows
+
+    async def _fill_range(self, symbol, interval, range_start, range_end):
+        rows = await self._fetch_range(symbol, interval, range_start, range_end)
+        await asyncio.to_thread(self.store.apply_range, symbol, interval, range_start, range_end, rows)
+
+    def _fill(self, symbol, interval, range_start, range_end):
+        """The task fetching and storing one missing range, shared by every caller that needs it."""
+        key = (symbol, interval, range_start, range_end)
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(
+                self._fill_range(symbol, interval, range_start, range_end))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def get_range(self, symbol: str, interval: str, start_ms: int, end_ms: int):
+        """Async `CandleStore.get_range`."""
+        ranges = await asyncio.to_thread(self.store.missing_ranges, symbol, interval, start_ms, end_ms)
+        # Shielded: one waiter being cancelled must not cancel a fetch others are awaiting
+        await asyncio.gather(*[
+            asyncio.shield(self._fill(symbol, interval, range_start, range_end))
+            for range_start, range_end in ranges
+        ])
+        return await asyncio.to_thread(self.store.window, symbol, interval, start_ms, end_ms)
+
+    async def get_klines(self, symbol: str = "BTCUSDT", interval: str = "1h", limit: int = 500):
+        """Async `CandleStore.get_klines`."""
+        start_ms, end_ms = self.store.latest_bounds(interval, limit)
+        return await self.get_range(symbol, interval, start_ms, end_ms)
+
+    async def get_historical_data(self, symbol, start_time, end_time, interval="1m"):
+        """Async `decision.get_historical_data` (times in UNIX seconds)."""
+        data = await self.get_range(symbol, interval, int(start_time * 1000), int(end_time * 1000))
+        return [{"open_time": k[0], "close": float(k[4])} for k in data]
+
+    async def get_price_at_time(self, symbol, timestamp):
+        """Async `decision.get_price_at_time`."""
+        historical_data = await self.get_historical_data(symbol, timestamp, timestamp + 60, interval="1m")
+        if historical_data:
+            return historical_data[0]['close']
+        raise ValueError(f"Could not fetch historical price for {symbol} at {timestamp}")
+
+    async def get_prices_at_times(self, pairs, interval="1m"):
+        """Async `decision.get_prices_at_times`; symbols are fetched concurrently."""
+        pairs = list(pairs)
+        step_ms = INTERVAL_MS[interval]
+        prices = [None] * len(pairs)
+
+        async def resolve(symbol, items):
+            timestamps_ms = [ts_ms for ts_ms, _ in items]
+            batches = await asyncio.gather(*[
+                self.get_range(symbol, interval, start, end)
+                for start, end in cover_spans(timestamps_ms, step_ms)
+            ])
+            rows = [row for batch in batches for row in batch]
+            for (_, index), price in zip(items, resolve_closes(rows, timestamps_ms, step_ms)):
+                prices[index] = price
+
+        await asyncio.gather(*[resolve(symbol, items) for symbol, items in group_timestamps(pairs).items()])
+        return prices
+
+
+_default_client = None
+
+
+def get_async_client():
+    """Return the process-wide AsyncMarketClient (its session opens on first use)."""
+    global _default_client
+    if _default_client is None:
+        _default_client = AsyncMarketClient()
+    return _default_client
+
+
+async def close_async_client():
+    global _default_client
+    if _default_client is not None:
+        await _default_client.close()
+        _default_client = None
@@ -0,0 +1,283 @@
+"""
+Historical backtester for the scoring and decision logic.
+
+Stored candles are replayed through the vectorized twin of
+`indicators.get_total_score` (every candle of every symbol in one pass), and
+the candles that can pass `decision.decide_to_buy` are then handed, in time
+order, to `decide_to_buy` and `calculate_trade_amount` themselves. Fills are
+simulated at the next candle's open with fees and slippage; positions exit on
+take-profit, stop-loss or after a maximum holding time.
+
+Nothing is fetched: candles come from the local candle store only.
+"""
+import time
+import heapq
+import numpy as np
+from batchindicators import get_score_components_matrix, weighted_components
+from candlestore import get_store, INTERVAL_MS
+from indicators import SCORE_WEIGHTS, calculate_hist_score
+from decision import (
+    decide_to_buy,
+    calculate_trade_amount,
+    SCORE_THRESHOLD,
+    HIST_SCORE_THRESHOLD,
+    MIN_PRICE_INCREASE,
+    MAX_PRICE_INCREASE
+)
+
+FEE_RATE = 0.001   # Binance spot taker fee
+SLIPPAGE = 0.0005  # Fraction of price lost on each fill
+FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def load_candles(symbols: list, interval: str, start_ms: int, end_ms: int, store=None) -> dict:
+    """
+    Closed stored candles for `symbols` as aligned (symbols, candles) matrices.
+    Symbols that start later are NaN-padded on the left; gaps inside a series
+    repeat the previous close with zero volume.
+    """
+    store = store or get_store()
+    now_ms = int(time.time() * 1000)
+    step = INTERVAL_MS[interval]
+    first = -(-int(start_ms) // step) * step
+    open_times = np.arange(first, int(end_ms) + 1, step, dtype=np.int64)
+    shape = (len(symbols), len(open_times))
+    data = {name: np.full(shape, np.nan) for name in FIELDS}
+
+    for row, symbol in enumerate(symbols):
+        klines = [k for k in store.window(symbol, interval, first, end_ms) if k[6] < now_ms]
+        if not klines:
+            continue
+        values = np.asarray([k[:6] for k in klines], dtype=float)
+        cols = ((values[:, 0] - first) // step).astype(int)
+        for i, name in enumerate(FIELDS, start=1):
+            data[name][row, cols] = values[:, i]
+
+    close = data["close"]
+    valid = ~np.isnan(close)
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(shape[1]), 0), axis=1)
+    gap = np.maximum.accumulate(valid, axis=1) & ~valid
+    previous_close = np.take_along_axis(close, last_valid, axis=1)
+    for name in ("open", "high", "low", "close"):
+        data[name][gap] = previous_close[gap]
+    data["volume"][gap] = 0.0
+
+    data["symbols"] = list(symbols)
+    data["open_time"] = open_times
+    return data
+
+
+def historical_pump_score(data: dict, row: int, t: int, window: int = 1000) -> int:
+    """
+    `analysis.analyze_historical_data` score over the `window` candles ending
+    at candle t: +10 for more than two >20% candles, +10 for more than two
+    volume spikes above 3x the window average.
+    """
+    lo = max(0, t - window + 1)
+    opens = data["open"][row, lo:t + 1]
+    closes = data["close"][row, lo:t + 1]
+    volumes = data["volume"][row, lo:t + 1]
+    valid = ~np.isnan(closes)
+    opens, closes, volumes = opens[valid], closes[valid], volumes[valid]
+    if len(closes) == 0:
+        return 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pct_increase = np.where(opens > 0, (closes - opens) / opens * 100, 0.0)
+    score = 10 if np.count_nonzero(pct_increase > 20) > 2 else 0
+    score += 10 if np.count_nonzero(volumes > 3 * volumes.mean()) > 2 else 0
+    return score
+
+
+def _simulate_trade(data, row, t, amount, take_profit, stop_loss, max_hold, fee_rate, slippage):
+    """Buy at candle t+1's open and follow highs/lows until an exit triggers."""
+    entry = t + 1
+    last = min(entry + max_hold - 1, data["close"].shape[1] - 1)
+    entry_price = data["open"][row, entry] * (1 + slippage)
+    if not entry_price > 0:
+        return None
+    quantity = amount * (1 - fee_rate) / entry_price
+    stop_price = entry_price * (1 - stop_loss)
+    target_price = entry_price * (1 + take_profit)
+
+    lows = data["low"][row, entry:last + 1]
+    highs = data["high"][row, entry:last + 1]
+    stop_hits = np.flatnonzero(lows <= stop_price)
+    target_hits = np.flatnonzero(highs >= target_price)
+    first_stop = stop_hits[0] if len(stop_hits) else None
+    first_target = target_hits[0] if len(target_hits) else None
+
+    # If both levels are inside the same candle, assume the stop filled first.
+    if first_stop is not None and (first_target is None or first_stop <= first_target):
+        exit_index, exit_price, reason = entry + first_stop, stop_price, "stop_loss"
+    elif first_target is not None:
+        exit_index, exit_price, reason = entry + first_target, target_price, "take_profit"
+    else:
+        exit_index, exit_price = last, data["close"][row, last]
+        reason = "max_hold" if last == entry + max_hold - 1 else "end_of_data"
+
+    gross = quantity * exit_price * (1 - slippage)
+    proceeds = gross * (1 - fee_rate)
+    return {
+        "symbol": data["symbols"][row],
+        "entry_time": int(data["open_time"][entry]),
+        "exit_time": int(data["open_time"][exit_index]),
+        "entry_price": float(entry_price),
+        "exit_price": float(exit_price),
+        "quantity": float(quantity),
+        "amount": float(amount),
+        "fees": float(amount * fee_rate + gross * fee_rate),
+        "pnl": float(proceeds - amount),
+        "exit_reason": reason,
+        "_exit_index": int(exit_index),
+        "_proceeds": float(proceeds),
+    }
+
+
+def max_drawdown(equity: list) -> float:
+    """Largest peak-to-trough fall of an equity curve, as a fraction of the peak."""
+    values = np.asarray([value for _, value in equity], dtype=float)
+    if len(values) == 0:
+        return 0.0
+    peaks = np.maximum.accumulate(values)
+    return float(np.max((peaks - values) / peaks))
+
+
+def run_backtest(
+    data: dict,
+    initial_balance: float = 1000.0,
+    sentiment=0.85,
+    price_lookback: int = 24,
+    take_profit: float = 0.10,
+    stop_loss: float = 0.05,
+    max_hold: int = 24,
+    max_allocation: float = 0.05,
+    hist_window: int = 1000,
+    fee_rate: float = FEE_RATE,
+    slippage: float = SLIPPAGE,
+    score_kwargs: dict = None,
+    weights: dict = None,
+    score_threshold: float = SCORE_THRESHOLD,
+    hist_score_threshold: float = HIST_SCORE_THRESHOLD,
+    components: dict = None,
+    hist_cache: dict = None
+) -> dict:
+    """
+    Replay `data` (from `load_candles`) and return PnL, drawdown and the trade log.
+
+    :param sentiment: Scalar, per-symbol column or (symbols, candles) matrix,
+                      e.g. rebuilt from archived posts. Defaults to the
+                      constant `mainscore` uses.
+    :param price_lookback: Candles back used as the "price at post time" when
+                           computing price_increase.
+    :param score_kwargs: Windows and thresholds for `get_score_components_matrix`.
+    :param weights: Overrides SCORE_WEIGHTS.
+    :param score_threshold, hist_score_threshold: Passed to `decide_to_buy`.
+    :param components: Precomputed `get_score_components_matrix` result for
+                       these candles, sentiment and score_kwargs (hist_score 0).
+    :param hist_cache: Dict reused across runs over the same `data` to keep
+                       historical pump scores by (row, candle, hist_window).
+    """
+    closes = data["close"]
+    n_candles = closes.shape[1]
+    score_kwargs = score_kwargs or {}
+    weights = weights or SCORE_WEIGHTS
+    hist_max_score = score_kwargs.get('hist_max_score', 20)
+    hist_cache = {} if hist_cache is None else hist_cache
+
+    # Everything except the historical component, for every candle at once.
+    if components is None:
+        components = get_score_components_matrix(closes, data["volume"], sentiment, 0, **score_kwargs)
+    base_score = weighted_components(components, weights)
+    hist_weight = weights['Historical'] * 100
+
+    price_increase = np.full(closes.shape, np.nan)
+    if n_candles > price_lookback:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            price_increase[:, price_lookback:] = (closes[:, price_lookback:] / closes[:, :-price_lookback] - 1) * 100
+
+    # Only candles that could pass decide_to_buy with the best possible
+    # historical score need the (comparatively costly) exact one.
+    with np.errstate(invalid='ignore'):
+        candidates = (
+            (base_score + hist_weight > score_threshold)
+            & (price_increase > MIN_PRICE_INCREASE)
+            & (price_increase < MAX_PRICE_INCREASE)
+        )
+    candidates[:, n_candles - 1:] = False  # No next candle to fill at
+    times, rows = np.nonzero(candidates.T)  # Time-major order
+
+    cash = initial_balance
+    busy_until = np.full(closes.shape[0], -1)
+    open_positions = []  # heap of (exit_index, sequence, trade)
+    equity = [(int(data["open_time"][0]) if n_candles else 0, cash)]
+    trades = []
+
+    def close_positions(until):
+        nonlocal cash
+        while open_positions and open_positions[0][0] <= until:
+            _, _, trade = heapq.heappop(open_positions)
+            cash += trade["_proceeds"]
+            # Open positions are counted at cost
+            equity.append((trade["exit_time"], cash + sum(p[2]["amount"] for p in open_positions)))
+
+    for t, row in zip(times.tolist(), rows.tolist()):
+        close_positions(t)
+        if busy_until[row] >= t:
+            continue
+
+        key = (row, t, hist_window)
+        if key not in hist_cache:
+            hist_cache[key] = historical_pump_score(data, row, t, hist_window)
+        hist_score = hist_cache[key]
+        total_score = base_score[row, t] + hist_weight * calculate_hist_score(hist_score, hist_max_score)
+        increase = float(price_increase[row, t])
+        if not decide_to_buy(total_score, hist_score, increase, score_threshold, hist_score_threshold):
+            continue
+
+        amount = min(calculate_trade_amount(hist_score, total_score, cash, len(open_positions), max_allocation), cash)
+        if amount <= 0:
+            continue
+        trade = _simulate_trade(data, row, t, amount, take_profit, stop_loss, max_hold, fee_rate, slippage)
+        if trade is None:
+            continue
+        trade.update(signal_time=int(data["open_time"][t]), total_score=float(total_score),
+                     hist_score=hist_score, price_increase=increase)
+        cash -= amount
+        busy_until[row] = trade["_exit_index"]
+        heapq.heappush(open_positions, (trade["_exit_index"], len(trades), trade))
+        trades.append(trade)
+
+    close_positions(n_candles)
+    for trade in trades:
+        del trade["_exit_index"], trade["_proceeds"]
+
+    total_pnl = cash - initial_balance
+    wins = sum(1 for trade in trades if trade["pnl"] > 0)
+    return {
+        "initial_balance": initial_balance,
+        "final_balance": cash,
+        "total_pnl": total_pnl,
+        "return_pct": total_pnl / initial_balance * 100 if initial_balance else 0.0,
+        "max_drawdown_pct": max_drawdown(equity) * 100,
+        "n_trades": len(trades),
+        "win_rate": wins / len(trades) if trades else 0.0,
+        "fees": sum(trade["fees"] for trade in trades),
+        "equity_curve": equity,
+        "trades": trades,
+    }
+
+
+def backtest(symbols: list, start_ms: int, end_ms: int, interval: str = "1h", **kwargs) -> dict:
+    """Load stored candles for `symbols` and run `run_backtest` over them."""
+    return run_backtest(load_candles(symbols, interval, start_ms, end_ms), **kwargs)
+
+
+if __name__ == "__main__":
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - 365 * 24 * 3_600_000
+    result = backtest(["BTCUSDT", "ETHUSDT", "ADAUSDT"], start_ms, end_ms)
+    print(f"Trades: {result['n_trades']} | PnL: {result['total_pnl']:.2f} "
+          f"({result['return_pct']:.2f}%) | Max drawdown: {result['max_drawdown_pct']:.2f}% "
+          f"| Win rate: {result['win_rate']:.0%}")
+    for trade in result["trades"]:
+        print(trade)
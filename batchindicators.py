@@ -0,0 +1,331 @@
+"""
+Vectorized multi-symbol version of `indicators.get_total_score`.
+
+Every function takes a 2D matrix of closes shaped (symbols, candles) and works
+on all symbols at once. Symbols with shorter histories are left-padded with
+NaN; each row then scores exactly like the un-padded Series would through the
+per-symbol `ta` based functions in indicators.py.
+"""
+import numpy as np
+from indicators import SCORE_WEIGHTS
+from candlestore import get_store
+
+
+def _ewm(values: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    """
+    Row-wise `Series.ewm(alpha=alpha, adjust=False, min_periods=min_periods).mean()`.
+    The recursion starts at each row's first non-NaN value; only leading NaN
+    padding is supported.
+    """
+    out = np.empty(values.shape)
+    state = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        col = values[:, t]
+        state = np.where(np.isnan(state), col, state + alpha * (col - state))
+        out[:, t] = state
+    out[np.cumsum(~np.isnan(values), axis=1) < min_periods] = np.nan
+    return out
+
+
+def ema_matrix(closes: np.ndarray, window: int) -> np.ndarray:
+    """Same values as `trend.EMAIndicator(...).ema_indicator()` for each row."""
+    return _ewm(closes, 2.0 / (window + 1), window)
+
+
+def rsi_matrix(closes: np.ndarray, window: int = 14) -> np.ndarray:
+    """Same values as `momentum.RSIIndicator(...).rsi()` for each row."""
+    diff = np.full(closes.shape, np.nan)
+    diff[:, 1:] = closes[:, 1:] - closes[:, :-1]
+    padded = np.isnan(closes)
+    up = np.where(padded, np.nan, np.where(diff > 0, diff, 0.0))
+    down = np.where(padded, np.nan, np.where(diff < 0, -diff, 0.0))
+    ema_up = _ewm(up, 1.0 / window, window)
+    ema_down = _ewm(down, 1.0 / window, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(ema_down == 0, 100.0, 100 - (100 / (1 + ema_up / ema_down)))
+    return np.where(np.isnan(ema_down), np.nan, rsi)
+
+
+def macd_hist_matrix(closes: np.ndarray, window_fast: int = 12, window_slow: int = 26,
+                     window_sign: int = 9) -> np.ndarray:
+    """Same values as `trend.MACD(...).macd_diff()` for each row."""
+    macd = ema_matrix(closes, window_fast) - ema_matrix(closes, window_slow)
+    signal = _ewm(macd, 2.0 / (window_sign + 1), window_sign)
+    return macd - signal
+
+
+def _last_two_sma(closes: np.ndarray, window: int):
+    """Latest and previous SMA values per row (NaN when the window isn't full)."""
+    n = closes.shape[1]
+    latest = closes[:, n - window:].mean(axis=1) if n >= window else np.full(closes.shape[0], np.nan)
+    previous = closes[:, n - window - 1:n - 1].mean(axis=1) if n > window else np.full(closes.shape[0], np.nan)
+    return latest, previous
+
+
+def _rolling_sum_count(values: np.ndarray, window: int):
+    """Row-wise rolling sum and non-NaN count over the last `window` columns."""
+    valid = ~np.isnan(values)
+    zeros = np.zeros((values.shape[0], 1))
+    csum = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=1)], axis=1)
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    lagged = np.maximum(np.arange(1, values.shape[1] + 1) - window, 0)
+    return csum[:, 1:] - csum[:, lagged], ccount[:, 1:] - ccount[:, lagged]
+
+
+def sma_matrix(closes: np.ndarray, window: int) -> np.ndarray:
+    """Same values as `trend.SMAIndicator(...).sma_indicator()` for each row."""
+    total, count = _rolling_sum_count(closes, window)
+    with np.errstate(invalid='ignore'):
+        return np.where(count == window, total / window, np.nan)
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the last `window` available values (fewer at the start), like mainscore's average volume."""
+    total, count = _rolling_sum_count(values, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def crossover_scores(short_latest, short_previous, long_latest, long_previous) -> np.ndarray:
+    """1.0 on a bullish cross, 0.0 on a bearish cross, 0.5 otherwise (including NaN)."""
+    bullish = (short_previous < long_previous) & (short_latest > long_latest)
+    bearish = (short_previous > long_previous) & (short_latest < long_latest)
+    return np.where(bullish, 1.0, np.where(bearish, 0.0, 0.5))
+
+
+def crossover_matrix(short: np.ndarray, long: np.ndarray) -> np.ndarray:
+    """Crossover score at every candle (0.5 for the first one)."""
+    scores = np.full(short.shape, 0.5)
+    scores[:, 1:] = crossover_scores(short[:, 1:], short[:, :-1], long[:, 1:], long[:, :-1])
+    return scores
+
+
+def rsi_level_scores(rsi, oversold: float = 30, neutral: float = 50) -> np.ndarray:
+    return np.where(np.isnan(rsi), 0.5, np.where(rsi < oversold, 1.0, np.where(rsi < neutral, 0.5, 0.0)))
+
+
+def macd_hist_scores(macd_hist) -> np.ndarray:
+    return np.where(np.isnan(macd_hist), 0.5, np.where(macd_hist > 0, 1.0, 0.0))
+
+
+def volume_spike_scores(current_volume, average_volume, threshold: float = 3.0) -> np.ndarray:
+    current_volume = np.asarray(current_volume, dtype=float)
+    average_volume = np.asarray(average_volume, dtype=float)
+    scores = np.where(
+        current_volume >= threshold * average_volume, 1.0,
+        np.where(current_volume >= 1.5 * average_volume, 0.5, 0.0)
+    )
+    return np.where(np.isnan(current_volume) | np.isnan(average_volume), 0.0, scores)
+
+
+def sentiment_scores(sentiment, threshold: float = 0.8) -> np.ndarray:
+    sentiment = np.asarray(sentiment, dtype=float)
+    scores = np.where(sentiment >= threshold, 1.0, sentiment / threshold)
+    return np.where(np.isnan(sentiment), 0.0, scores)
+
+
+def hist_scores(hist_score, max_hist_score: int = 20) -> np.ndarray:
+    hist_score = np.maximum(np.asarray(hist_score, dtype=float), 0)
+    return np.minimum(hist_score / max_hist_score, 1.0)
+
+
+def get_total_scores(
+    closes: np.ndarray,
+    current_volume,
+    average_volume,
+    sentiment,
+    hist_score,
+    rsi_window: int = 14,
+    macd_window_short: int = 12,
+    macd_window_long: int = 26,
+    sma_short_window: int = 20,
+    sma_long_window: int = 50,
+    ema_short_window: int = 12,
+    ema_long_window: int = 26,
+    volume_threshold: float = 3.0,
+    sentiment_threshold: float = 0.8,
+    hist_max_score: int = 20,
+    rsi_oversold: float = 30,
+    rsi_neutral: float = 50,
+    weights: dict = None
+) -> np.ndarray:
+    """
+    Score every row of `closes` at once; returns an array of totals in [0, 100]
+    that matches `get_total_score` row by row. Volume, sentiment and hist
+    arguments may be per-symbol arrays or scalars.
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=float))
+
+    ema_cache = {}
+
+    def ema(window):
+        if window not in ema_cache:
+            ema_cache[window] = ema_matrix(closes, window)
+        return ema_cache[window]
+
+    rsi_score = rsi_level_scores(rsi_matrix(closes, rsi_window)[:, -1], rsi_oversold, rsi_neutral)
+
+    macd = ema(macd_window_short) - ema(macd_window_long)
+    macd_hist = (macd - _ewm(macd, 2.0 / (9 + 1), 9))[:, -1]  # trend.MACD default window_sign
+    macd_score = macd_hist_scores(macd_hist)
+
+    sma_short, sma_short_prev = _last_two_sma(closes, sma_short_window)
+    sma_long, sma_long_prev = _last_two_sma(closes, sma_long_window)
+    sma_score = crossover_scores(sma_short, sma_short_prev, sma_long, sma_long_prev)
+
+    if closes.shape[1] >= 2:
+        ema_short, ema_long = ema(ema_short_window), ema(ema_long_window)
+        ema_score = crossover_scores(ema_short[:, -1], ema_short[:, -2], ema_long[:, -1], ema_long[:, -2])
+    else:
+        ema_score = np.full(closes.shape[0], 0.5)
+
+    volume_spike_score = volume_spike_scores(current_volume, average_volume, threshold=volume_threshold)
+    sentiment_score = sentiment_scores(sentiment, threshold=sentiment_threshold)
+    hist_score_normalized = hist_scores(hist_score, max_hist_score=hist_max_score)
+
+    return weighted_total(
+        rsi_score, macd_score, sma_score, ema_score,
+        volume_spike_score, sentiment_score, hist_score_normalized,
+        weights=weights or SCORE_WEIGHTS
+    )
+
+
+def weighted_total(rsi_score, macd_score, sma_score, ema_score, volume_spike_score,
+                   sentiment_score, hist_score_normalized, weights: dict = SCORE_WEIGHTS):
+    total_score = (
+        weights['RSI'] * rsi_score +
+        weights['MACD'] * macd_score +
+        weights['SMA_Crossover'] * sma_score +
+        weights['EMA_Crossover'] * ema_score +
+        weights['Volume_Spike'] * volume_spike_score +
+        weights['Sentiment'] * sentiment_score +
+        weights['Historical'] * hist_score_normalized
+    ) * 100
+
+    return total_score
+
+
+def get_score_components_matrix(
+    closes: np.ndarray,
+    volumes: np.ndarray,
+    sentiment,
+    hist_score,
+    volume_window: int = 500,
+    rsi_window: int = 14,
+    macd_window_short: int = 12,
+    macd_window_long: int = 26,
+    sma_short_window: int = 20,
+    sma_long_window: int = 50,
+    ema_short_window: int = 12,
+    ema_long_window: int = 26,
+    volume_threshold: float = 3.0,
+    sentiment_threshold: float = 0.8,
+    hist_max_score: int = 20,
+    rsi_oversold: float = 30,
+    rsi_neutral: float = 50,
+    indicator_cache: dict = None
+) -> dict:
+    """
+    Unweighted component scores at every candle, keyed like SCORE_WEIGHTS.
+    Reweighting them with `weighted_components` is cheap, so a sweep over
+    weights only has to compute these once.
+
+    `indicator_cache` keeps the threshold-independent matrices (RSI, MACD and
+    crossover scores, average volume) keyed by their windows, so calls over
+    the same closes that only change thresholds skip the indicator math.
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=float))
+    volumes = np.atleast_2d(np.asarray(volumes, dtype=float))
+    cache = {} if indicator_cache is None else indicator_cache
+
+    def cached(key, compute):
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
+    rsi = cached(('rsi', rsi_window), lambda: rsi_matrix(closes, rsi_window))
+    average_volume = cached(('volume_mean', volume_window), lambda: rolling_mean(volumes, volume_window))
+
+    return {
+        'RSI': rsi_level_scores(rsi, rsi_oversold, rsi_neutral),
+        'MACD': cached(
+            ('macd', macd_window_short, macd_window_long),
+            lambda: macd_hist_scores(macd_hist_matrix(closes, macd_window_short, macd_window_long))
+        ),
+        'SMA_Crossover': cached(
+            ('sma_crossover', sma_short_window, sma_long_window),
+            lambda: crossover_matrix(sma_matrix(closes, sma_short_window), sma_matrix(closes, sma_long_window))
+        ),
+        'EMA_Crossover': cached(
+            ('ema_crossover', ema_short_window, ema_long_window),
+            lambda: crossover_matrix(ema_matrix(closes, ema_short_window), ema_matrix(closes, ema_long_window))
+        ),
+        'Volume_Spike': volume_spike_scores(volumes, average_volume, threshold=volume_threshold),
+        'Sentiment': sentiment_scores(sentiment, threshold=sentiment_threshold),
+        'Historical': hist_scores(hist_score, max_hist_score=hist_max_score),
+    }
+
+
+def weighted_components(components: dict, weights: dict = None) -> np.ndarray:
+    """`weighted_total` over a `get_score_components_matrix` result."""
+    weights = weights or SCORE_WEIGHTS
+    return weighted_total(
+        components['RSI'], components['MACD'], components['SMA_Crossover'], components['EMA_Crossover'],
+        components['Volume_Spike'], components['Sentiment'], components['Historical'],
+        weights=weights
+    )
+
+
+def get_total_score_matrix(closes: np.ndarray, volumes: np.ndarray, sentiment, hist_score,
+                           weights: dict = None, **kwargs) -> np.ndarray:
+    """
+    Total score at every candle of every row, shaped like `closes`: entry
+    [i, t] is what `mainscore` would give for symbol i with candle t as the
+    latest one (volume averaged over the last `volume_window` candles).
+    `sentiment` and `hist_score` may be scalars, per-symbol columns or full
+    (symbols, candles) matrices; `kwargs` are the windows and thresholds of
+    `get_score_components_matrix`.
+    """
+    components = get_score_components_matrix(closes, volumes, sentiment, hist_score, **kwargs)
+    return weighted_components(components, weights)
+
+
+def klines_to_matrix(klines_by_symbol: list):
+    """
+    Stack raw kline lists into left-padded (closes, volumes) matrices.
+    """
+    width = max((len(k) for k in klines_by_symbol), default=0)
+    closes = np.full((len(klines_by_symbol), width), np.nan)
+    volumes = np.full((len(klines_by_symbol), width), np.nan)
+    for row, klines in enumerate(klines_by_symbol):
+        if not klines:
+            continue
+        data = np.asarray([(k[4], k[5]) for k in klines], dtype=float)
+        closes[row, width - len(klines):] = data[:, 0]
+        volumes[row, width - len(klines):] = data[:, 1]
+    return closes, volumes
+
+
+def mainscores(symbols: list, interval: str = '1h', limit: int = 500) -> dict:
+    """Batch counterpart of `indicators.mainscore` for a whole list of symbols."""
+    store = get_store()
+    closes, volumes = klines_to_matrix(
+        [store.get_klines(symbol=symbol, interval=interval, limit=limit) for symbol in symbols]
+    )
+    if closes.shape[1] == 0:
+        return {symbol: float('nan') for symbol in symbols}
+    current_volume = volumes[:, -1]
+    with np.errstate(invalid='ignore'):
+        average_volume = np.nanmean(volumes, axis=1)
+
+    sentiment = 0.85
+    hist_score = 15
+
+    totals = get_total_scores(
+        closes=closes,
+        current_volume=current_volume,
+        average_volume=average_volume,
+        sentiment=sentiment,
+        hist_score=hist_score
+    )
+    return {symbol: float(total) for symbol, total in zip(symbols, totals)}
@@ -0,0 +1,321 @@
+"""
+Local incremental candle store.
+
+Klines are kept per (symbol, interval) in memory and in a small SQLite file so
+that indicators, analysis and decision all read the same candles. Only candles
+newer than the last stored close_time are requested from Binance, and holes in
+the maintained window are back-filled on the next sync.
+"""
+import os
+import json
+import time
+import bisect
+import sqlite3
+import threading
+import requests
+
+KLINES_URL = "https://api.binance.com/api/v3/klines"
+CANDLE_DB_PATH = os.getenv("CANDLE_DB_PATH", "candles.sqlite3")
+MAX_KLINES_PER_REQUEST = 1000
+LIVE_CANDLE_TTL = 30  # Seconds a still-open candle is served before it is refetched
+
+INTERVAL_MS = {
+    "1m": 60_000,
+    "3m": 3 * 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1h": 3_600_000,
+    "2h": 2 * 3_600_000,
+    "4h": 4 * 3_600_000,
+    "6h": 6 * 3_600_000,
+    "8h": 8 * 3_600_000,
+    "12h": 12 * 3_600_000,
+    "1d": 86_400_000,
+    "3d": 3 * 86_400_000,
+    "1w": 7 * 86_400_000,
+}
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class CandleStore:
+    """
+    Serves raw Binance kline rows (the same 12-field lists `/api/v3/klines`
+    returns) from memory, backed by SQLite, fetching only what is missing.
+    """
+
+    def __init__(self, db_path=CANDLE_DB_PATH, session=None, live_ttl=LIVE_CANDLE_TTL):
+        self.db_path = db_path
+        self.live_ttl = live_ttl
+        self._session = session or requests.Session()
+        self._lock = threading.RLock()
+        self._series = {}      # (symbol, interval) -> closed kline rows sorted by open_time
+        self._open_times = {}  # (symbol, interval) -> open_time of each row, for bisect
+        self._live = {}        # (symbol, interval) -> (fetched_at, row) of the still-open candle
+        self._known_gaps = set()  # (symbol, interval, open_time) Binance has no candle for
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS candles (
+                symbol TEXT,
+                interval TEXT,
+                open_time INTEGER,
+                close_time INTEGER,
+                data TEXT,
+                PRIMARY KEY (symbol, interval, open_time)
+            )
+        ''')
+        self._conn.commit()
+
+    # ---- Binance ----
+
+    def _fetch(self, symbol, interval, start_ms=None, end_ms=None, limit=MAX_KLINES_PER_REQUEST):
+        params = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_ms is not None:
+            params["startTime"] = int(start_ms)
+        if end_ms is not None:
+            params["endTime"] = int(end_ms)
+        response = self._session.get(KLINES_URL, params=params)
+        if response.status_code != 200:
+            raise ValueError(f"Failed to fetch klines for {symbol} {interval}: {response.text}")
+        return response.json()
+
+    def _fetch_range(self, symbol, interval, start_ms, end_ms):
+        """Fetch every kline with open_time in [start_ms, end_ms], paging by 1000."""
+        rows = []
+        while start_ms <= end_ms:
+            batch = self._fetch(symbol, interval, start_ms, end_ms)
+            if not batch:
+                break
+            rows.extend(batch)
+            if len(batch) < MAX_KLINES_PER_REQUEST:
+                break
+            start_ms = batch[-1][0] + 1
+        return rows
+
+    # ---- storage ----
+
+    def _load(self, key):
+        if key in self._series:
+            return
+        cur = self._conn.execute(
+            "SELECT data FROM candles WHERE symbol = ? AND interval = ? ORDER BY open_time",
+            key
+        )
+        rows = [json.loads(data) for (data,) in cur.fetchall()]
+        self._series[key] = rows
+        self._open_times[key] = [row[0] for row in rows]
+
+    def _store(self, key, rows, now_ms):
+        """Merge fetched rows; closed candles are persisted, the open one is kept live."""
+        closed = []
+        for row in rows:
+            if row[6] >= now_ms:
+                self._live[key] = (time.time(), row)
+            else:
+                closed.append(row)
+        if not closed:
+            return
+
+        series = self._series[key]
+        open_times = self._open_times[key]
+        for row in closed:
+            if not open_times or row[0] > open_times[-1]:
+                series.append(row)
+                open_times.append(row[0])
+                continue
+            i = bisect.bisect_left(open_times, row[0])
+            if i < len(open_times) and open_times[i] == row[0]:
+                series[i] = row
+            else:
+                series.insert(i, row)
+                open_times.insert(i, row[0])
+
+        live = self._live.get(key)
+        if live and live[1][0] <= open_times[-1]:
+            del self._live[key]
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO candles (symbol, interval, open_time, close_time, data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(key[0], key[1], row[0], row[6], json.dumps(row)) for row in closed]
+        )
+        self._conn.commit()
+
+    def _missing(self, key, start_ms, end_ms, step, now_ms):
+        """Open times in [start_ms, end_ms] that should exist but are not stored."""
+        open_times = self._open_times[key]
+        live = self._live.get(key)
+        live_fresh = live and time.time() - live[0] < self.live_ttl
+        missing = []
+        t = -(-start_ms // step) * step  # First candle boundary at or after start_ms
+        i = bisect.bisect_left(open_times, t)
+        while t <= end_ms and t <= now_ms:
+            while i < len(open_times) and open_times[i] < t:
+                i += 1
+            present = i < len(open_times) and open_times[i] == t
+            if live_fresh and live[1][0] == t:
+                present = True
+            if not present and (key[0], key[1], t) not in self._known_gaps:
+                missing.append(t)
+            t += step
+        return missing
+
+    @staticmethod
+    def _group(missing, step):
+        """Collapse sorted open times into contiguous (start, end) ranges."""
+        start = prev = None
+        ranges = []
+        for t in missing:
+            if start is None:
+                start = prev = t
+            elif t == prev + step:
+                prev = t
+            else:
+                ranges.append((start, prev))
+                start = prev = t
+        if start is not None:
+            ranges.append((start, prev))
+        return ranges
+
+    # ---- public API ----
+    #
+    # Reads are split into plan (`missing_ranges`), fetch and `apply_range`
+    # so the network step can be done by any client (see asyncmarket.py)
+    # without holding the store lock.
+
+    @staticmethod
+    def latest_bounds(interval, limit):
+        """(start_ms, end_ms) covering the latest `limit` candles, open one included."""
+        step = INTERVAL_MS[interval]
+        current_open = _now_ms() // step * step
+        return current_open - (limit - 1) * step, current_open
+
+    def missing_ranges(self, symbol, interval, start_ms, end_ms):
+        """Ranges of open times in [start_ms, end_ms] that need fetching."""
+        step = INTERVAL_MS[interval]
+        key = (symbol, interval)
+        with self._lock:
+            self._load(key)
+            missing = self._missing(key, int(start_ms), int(end_ms), step, _now_ms())
+        return self._group(missing, step)
+
+    def apply_range(self, symbol, interval, range_start, range_end, rows):
+        """Store the rows fetched for one range returned by `missing_ranges`."""
+        step = INTERVAL_MS[interval]
+        key = (symbol, interval)
+        now_ms = _now_ms()
+        with self._lock:
+            self._load(key)
+            self._store(key, rows, now_ms)
+            got = {row[0] for row in rows}
+            for t in range(range_start, range_end + 1, step):
+                # Candles that close in the past but Binance didn't return are
+                # exchange downtime; don't ask for them again.
+                if t not in got and t + step <= now_ms:
+                    self._known_gaps.add((symbol, interval, t))
+
+    def window(self, symbol, interval, start_ms, end_ms):
+        """Stored klines with open_time in [start_ms, end_ms], without fetching."""
+        key = (symbol, interval)
+        with self._lock:
+            self._load(key)
+            return self._window(key, int(start_ms), int(end_ms))
+
+    def get_range(self, symbol, interval, start_ms, end_ms):
+        """
+        Return klines with open_time in [start_ms, end_ms] (milliseconds), the
+        same rows `/api/v3/klines?startTime=..&endTime=..` would return.
+        """
+        for range_start, range_end in self.missing_ranges(symbol, interval, start_ms, end_ms):
+            rows = self._fetch_range(symbol, interval, range_start, range_end)
+            self.apply_range(symbol, interval, range_start, range_end, rows)
+        return self.window(symbol, interval, start_ms, end_ms)
+
+    def get_klines(self, symbol="BTCUSDT", interval="1h", limit=500):
+        """
+        Return the latest `limit` klines (including the still-open candle),
+        like `client.get_klines`. Only the candles after the last stored
+        close_time and any gaps in the window are requested from Binance.
+        """
+        start_ms, end_ms = self.latest_bounds(interval, limit)
+        return self.get_range(symbol, interval, start_ms, end_ms)
+
+    def add_klines(self, symbol, interval, rows):
+        """Push klines received elsewhere (e.g. the WebSocket kline stream)."""
+        key = (symbol, interval)
+        with self._lock:
+            self._load(key)
+            self._store(key, rows, _now_ms())
+
+    def _window(self, key, start_ms, end_ms):
+        series = self._series[key]
+        open_times = self._open_times[key]
+        lo = bisect.bisect_left(open_times, start_ms)
+        hi = bisect.bisect_right(open_times, end_ms)
+        rows = series[lo:hi]
+        live = self._live.get(key)
+        if live and start_ms <= live[1][0] <= end_ms and (not rows or live[1][0] > rows[-1][0]):
+            rows = rows + [live[1]]
+        return rows
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def group_timestamps(pairs):
+    """{symbol: [(timestamp_ms, input_index), ...] sorted by time} for (symbol, unix_seconds) pairs."""
+    by_symbol = {}
+    for index, (symbol, timestamp) in enumerate(pairs):
+        by_symbol.setdefault(symbol, []).append((int(timestamp * 1000), index))
+    for items in by_symbol.values():
+        items.sort()
+    return by_symbol
+
+
+def cover_spans(timestamps_ms, step_ms):
+    """
+    Group sorted timestamps into as few [start, end] kline ranges as possible,
+    each short enough for one request, so that every timestamp's candle (the
+    first one opening at or after it) is inside a range.
+    """
+    spans = []
+    for ts_ms in timestamps_ms:
+        end = ts_ms + step_ms
+        if spans and end - spans[-1][0] < MAX_KLINES_PER_REQUEST * step_ms:
+            spans[-1][1] = end
+        else:
+            spans.append([ts_ms, end])
+    return spans
+
+
+def resolve_closes(rows, timestamps_ms, step_ms):
+    """
+    Close price of the first candle opening within one step at or after each
+    timestamp (what `decision.get_price_at_time` returns), or None.
+    """
+    open_times = [row[0] for row in rows]
+    closes = []
+    for ts_ms in timestamps_ms:
+        i = bisect.bisect_left(open_times, ts_ms)
+        if i < len(open_times) and open_times[i] <= ts_ms + step_ms:
+            closes.append(float(rows[i][4]))
+        else:
+            closes.append(None)
+    return closes
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide CandleStore shared by every call site."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = CandleStore()
+        return _default_store
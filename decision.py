@@ -1,15 +1,23 @@
+import logging
+from datetime import datetime
 from dateutil import parser
-import requests
+from candlestore import get_store, group_timestamps, cover_spans, resolve_closes, INTERVAL_MS
+from marketdata import get_market_data, MARKET_DATA_MAX_AGE
+from tickersnapshot import get_snapshot
+from asyncmarket import get_async_client
+
+logger = logging.getLogger(__name__)
 
 def get_binance_data(symbol):
-    # Fetch current ticker data
-    response = requests.get("https://api.binance.com/api/v3/ticker/24hr?symbol=" + symbol)
-    data = response.json()
-    # Extract relevant fields
-    current_price = float(data["lastPrice"])
-    price_change_percent = float(data["priceChangePercent"])
-    volume = float(data["volume"])
-    return current_price, price_change_percent, volume
+    # Serve from the live WebSocket ticker table when the stream is up
+    stream = get_market_data()
+    if stream is not None and stream.connected:
+        ticker = stream.get_ticker(symbol, max_age=MARKET_DATA_MAX_AGE)
+        if ticker is not None:
+            return ticker
+
+    # Otherwise (or when the entry is stale) read the per-cycle snapshot of all 24hr tickers
+    return get_snapshot().get_ticker(symbol)
 
 def get_historical_data(symbol, start_time, end_time, interval="1m"):
     """
@@ -21,19 +29,13 @@ def get_historical_data(symbol, start_time, end_time, interval="1m"):
     :param interval: Time interval for the data (e.g., '1m', '1h').
     :return: List of historical data points.
     """
-    url = "https://api.binance.com/api/v3/klines"
-    params = {
-        "symbol": symbol,
-        "interval": interval,
-        "startTime": int(start_time * 1000),  # Convert to milliseconds
-        "endTime": int(end_time * 1000)      # Convert to milliseconds
-    }
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        return [{"open_time": k[0], "close": float(k[4])} for k in data]  # Extract close prices
-    else:
-        raise ValueError(f"Failed to fetch historical data: {response.text}")
+    data = get_store().get_range(
+        symbol,
+        interval,
+        int(start_time * 1000),  # Convert to milliseconds
+        int(end_time * 1000)     # Convert to milliseconds
+    )
+    return [{"open_time": k[0], "close": float(k[4])} for k in data]  # Extract close prices
 
 
 def get_price_at_time(symbol, timestamp):
@@ -51,25 +53,88 @@ def get_price_at_time(symbol, timestamp):
         raise ValueError(f"Could not fetch historical price for {symbol} at {timestamp}")
 
 
-def assess_price_volume(post_time, symbol):
+def get_prices_at_times(pairs, interval="1m"):
+    """
+    Batch version of `get_price_at_time` for many posts at once.
+
+    Timestamps are grouped by symbol and covered with as few kline ranges as
+    possible (reusing stored candles), then each one is resolved with a
+    sorted-array search.
+
+    :param pairs: Sequence of (symbol, unix_timestamp) pairs.
+    :param interval: Candle interval used for the lookup.
+    :return: List of prices in input order, None where no candle exists.
+    """
+    pairs = list(pairs)
+    store = get_store()
+    step_ms = INTERVAL_MS[interval]
+    prices = [None] * len(pairs)
+
+    for symbol, items in group_timestamps(pairs).items():
+        timestamps_ms = [ts_ms for ts_ms, _ in items]
+        rows = []
+        for start, end in cover_spans(timestamps_ms, step_ms):
+            rows.extend(store.get_range(symbol, interval, start, end))
+        for (_, index), price in zip(items, resolve_closes(rows, timestamps_ms, step_ms)):
+            prices[index] = price
+    return prices
+
+
+def to_timestamp(post_time):
+    """UNIX seconds for a post time given as a datetime, a number or a date string."""
+    if isinstance(post_time, datetime):
+        return post_time.timestamp()
+    if isinstance(post_time, (int, float)):
+        return float(post_time)
+    return parser.parse(post_time).timestamp()
+
+
+def assess_price_volume(post_time, symbol, price_at_post_time=None):
+    """
+    Price and volume scores since `post_time`. Pass `price_at_post_time`
+    from a batched `get_prices_at_times` call when scoring many coins;
+    otherwise it is looked up here.
+    """
     # Convert post time to timestamp
-    post_timestamp = parser.parse(post_time).timestamp()
+    post_timestamp = to_timestamp(post_time)
 
     # Fetch price at the time of the post
-    try:
-        price_at_post_time = get_price_at_time(symbol, post_timestamp)
-    except ValueError as e:
-        print(e)
+    if price_at_post_time is None:
+        price_at_post_time = get_prices_at_times([(symbol, post_timestamp)])[0]
+    if price_at_post_time is None:
+        logger.warning("Could not fetch historical price for %s at %s", symbol, post_timestamp,
+                       extra={"coin": symbol, "stage": "price_volume"})
         return 0, 0, 0, 0
 
     # Fetch current price and volume data
     current_price, price_change_percent, current_volume = get_binance_data(symbol)
 
+    return score_price_volume(price_at_post_time, current_price, current_volume)
+
+
+async def assess_price_volume_async(post_time, symbol, price_at_post_time=None):
+    """Non-blocking `assess_price_volume` using the pooled async market client."""
+    client = get_async_client()
+    post_timestamp = to_timestamp(post_time)
+
+    if price_at_post_time is None:
+        price_at_post_time = (await client.get_prices_at_times([(symbol, post_timestamp)]))[0]
+    if price_at_post_time is None:
+        logger.warning("Could not fetch historical price for %s at %s", symbol, post_timestamp,
+                       extra={"coin": symbol, "stage": "price_volume"})
+        return 0, 0, 0, 0
+
+    current_price, price_change_percent, current_volume = await client.get_binance_data(symbol)
+
+    return score_price_volume(price_at_post_time, current_price, current_volume)
+
+
+def score_price_volume(price_at_post_time, current_price, current_volume):
     # Calculate price increase
     price_increase = ((current_price - price_at_post_time) / price_at_post_time) * 100
 
-    # Fetch historical volume data
-    _, _, avg_24h_volume = get_binance_data(symbol)
+    # Historical volume comes from the same 24hr ticker read above
+    avg_24h_volume = current_volume
     volume_spike = current_volume / avg_24h_volume if avg_24h_volume else 1
 
     # Score calculation
@@ -128,12 +193,15 @@ def calculate_trade_amount(hist_score, total_score, portfolio_balance, existing_
     return trade_amount
 
 
-def decide_to_buy(total_score, hist_score, price_increase):
-    SCORE_THRESHOLD = 70
-    HIST_SCORE_THRESHOLD = 10
-    
-    signals = sum([price_increase > 10, hist_score > 0])
-    
-    if total_score > SCORE_THRESHOLD and signals >= 2 and price_increase < 50 and hist_score >= HIST_SCORE_THRESHOLD:
+SCORE_THRESHOLD = 70
+HIST_SCORE_THRESHOLD = 10
+MIN_PRICE_INCREASE = 10  # % rise since the post that counts as a signal
+MAX_PRICE_INCREASE = 50  # % rise past which the pump is considered over
+
+def decide_to_buy(total_score, hist_score, price_increase,
+                  score_threshold=SCORE_THRESHOLD, hist_score_threshold=HIST_SCORE_THRESHOLD):
+    signals = sum([price_increase > MIN_PRICE_INCREASE, hist_score > 0])
+
+    if total_score > score_threshold and signals >= 2 and price_increase < MAX_PRICE_INCREASE and hist_score >= hist_score_threshold:
         return True
     return False
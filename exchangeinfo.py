@@ -0,0 +1,93 @@
+"""
+Cached exchange-info symbol filter index.
+
+`exchangeInfo` is several MB; it is downloaded once per client endpoint,
+indexed by symbol and filter type, and refreshed after a TTL or when an order
+is rejected by a symbol filter.
+"""
+import os
+import time
+import threading
+
+EXCHANGE_INFO_TTL = float(os.getenv("EXCHANGE_INFO_TTL", "3600"))  # seconds
+
+
+def is_filter_rejection(error) -> bool:
+    """True for Binance order rejections caused by a symbol filter (code -1013)."""
+    return getattr(error, "code", None) == -1013 or "Filter failure" in str(error)
+
+
+class ExchangeInfoCache:
+    def __init__(self, fetch, ttl: float = EXCHANGE_INFO_TTL):
+        """
+        :param fetch: Callable returning the `exchangeInfo` payload,
+                      e.g. `client.get_exchange_info`.
+        :param ttl: Seconds before the index is reloaded.
+        """
+        self._fetch = fetch
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._symbols = {}  # symbol -> {"status": ..., "filters": {filterType: filter}}
+        self.loaded_at = 0.0
+
+    def refresh(self):
+        exchange_info = self._fetch()
+        symbols = {}
+        for symbol_info in exchange_info['symbols']:
+            symbols[symbol_info['symbol']] = {
+                "status": symbol_info.get('status'),
+                "filters": {f['filterType']: f for f in symbol_info.get('filters', [])},
+            }
+        with self._lock:
+            self._symbols = symbols
+            self.loaded_at = time.time()
+        return self
+
+    def invalidate(self):
+        """Force a reload on the next lookup (e.g. after a filter rejection)."""
+        with self._lock:
+            self.loaded_at = 0.0
+
+    def _symbol(self, symbol: str):
+        if time.time() - self.loaded_at > self.ttl:
+            self.refresh()
+        return self._symbols.get(symbol)
+
+    def get_filter(self, symbol: str, filter_type: str):
+        info = self._symbol(symbol)
+        return info["filters"].get(filter_type) if info else None
+
+    def lot_size(self, symbol: str):
+        return self.get_filter(symbol, 'LOT_SIZE')
+
+    def price_filter(self, symbol: str):
+        return self.get_filter(symbol, 'PRICE_FILTER')
+
+    def min_notional(self, symbol: str):
+        # Spot symbols migrated from MIN_NOTIONAL to NOTIONAL; accept either.
+        return self.get_filter(symbol, 'MIN_NOTIONAL') or self.get_filter(symbol, 'NOTIONAL')
+
+    def is_tradable(self, symbol: str) -> bool:
+        info = self._symbol(symbol)
+        return bool(info) and info["status"] == 'TRADING'
+
+    def quantity_precision(self, symbol: str) -> int:
+        """Decimal places allowed by LOT_SIZE's stepSize (0 if unknown)."""
+        lot_size = self.lot_size(symbol)
+        if not lot_size:
+            return 0
+        step_size = float(lot_size['stepSize'])
+        return len(str(step_size).split('.')[-1].rstrip('0'))
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_exchange_info_cache(client) -> ExchangeInfoCache:
+    """One cache per API endpoint, so testnet and mainnet filters never mix."""
+    key = getattr(client, 'API_URL', None)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = ExchangeInfoCache(client.get_exchange_info)
+        return _caches[key]
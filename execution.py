@@ -1,13 +1,17 @@
 from binance.client import Client
 from binance.enums import *
 import os
+import logging
 from dotenv import load_dotenv
+from exchangeinfo import get_exchange_info_cache, is_filter_rejection
 
 # Load environment variables
 load_dotenv()
 api_key = os.environ.get('TEST_API_KEY')
 api_secret = os.environ.get('TEST_SECRET')
 
+logger = logging.getLogger(__name__)
+
 
 def initialize_testnet_client(api_key: str, api_secret: str) -> Client:
     """
@@ -27,7 +31,7 @@ def check_connectivity(client: Client) -> bool:
         client.ping()
         return True
     except Exception as e:
-        print(f"Connectivity check failed: {e}")
+        logger.warning("Connectivity check failed: %s", e)
         return False
 
 
@@ -44,12 +48,12 @@ def get_portfolio_balance(client: Client, coin: str) -> float:
         # Filter the specific coin balance
         for balance in balances:
             if balance['asset'] == coin:
-                print(f"--------Account Balance for {coin}: {float(balance['free'])}")
+                logger.debug("Account balance: %s", balance['free'], extra={"coin": coin, "stage": "balance"})
                 return float(balance['free'])
-        print(f"No balance found for {coin}.")
+        logger.info("No balance found for %s.", coin, extra={"coin": coin, "stage": "balance"})
         return 0.0
     except Exception as e:
-        print(f"Failed to fetch portfolio balance for {coin}: {e}")
+        logger.error("Failed to fetch portfolio balance for %s: %s", coin, e, extra={"coin": coin, "stage": "balance"})
         return 0.0
     
     
@@ -73,10 +77,10 @@ def get_open_positions(client: Client) -> dict:
             if float(position.get('positionAmt', 0)) != 0
         ]
         
-        print(f"Open Positions: {open_positions}")
+        logger.debug("Open Positions: %s", open_positions)
         return open_positions
     except Exception as e:
-        print(f"Failed to fetch open positions: {e}")
+        logger.error("Failed to fetch open positions: %s", e)
         return {"error": str(e)}
 
    
@@ -101,7 +105,10 @@ def execute_trade(
         )
         return order
     except Exception as e:
-        print(f"Order execution failed: {e}")
+        logger.error("Order execution failed: %s", e, extra={"coin": symbol, "stage": "order"})
+        if is_filter_rejection(e):
+            # Symbol filters may have changed; reload them before the next order
+            get_exchange_info_cache(client).invalidate()
         return {"error": str(e)}
 
 
@@ -1,9 +1,25 @@
+import time
+import logging
 import pandas as pd
 import numpy as np
 from ta import trend, momentum
 from typing import Optional
-from binance.client import Client
 from binance.enums import *
+from candlestore import get_store
+from asyncmarket import get_async_client
+from streamindicators import IndicatorState, get_indicator_book
+
+logger = logging.getLogger(__name__)
+
+SCORE_WEIGHTS = {
+    'RSI': 0.15,
+    'MACD': 0.15,
+    'SMA_Crossover': 0.15,
+    'EMA_Crossover': 0.15,
+    'Volume_Spike': 0.15,
+    'Sentiment': 0.15,
+    'Historical': 0.10
+}
 
 def calculate_rsi(close_prices: pd.Series, window: int = 14) -> float:
     """
@@ -11,13 +27,13 @@ def calculate_rsi(close_prices: pd.Series, window: int = 14) -> float:
     If not enough data is available, return NaN.
     """
     if len(close_prices) < window:
-        print("Not enough data to calculate RSI.")
+        logger.debug("Not enough data to calculate RSI.")
         return float('nan')
     
     rsi_series = momentum.RSIIndicator(close=close_prices, window=window).rsi()
     non_nan_rsi = rsi_series.dropna()
     if non_nan_rsi.empty:
-        print("RSI calculation returned no valid values.")
+        logger.debug("RSI calculation returned no valid values.")
         return float('nan')
     
     latest_rsi = non_nan_rsi.iloc[-1]
@@ -27,13 +43,21 @@ def calculate_macd(close_prices: pd.Series) -> float:
     macd = trend.MACD(close=close_prices)
     macd_hist = macd.macd_diff().dropna()
     if macd_hist.empty:
-        print("Not enough data to calculate MACD.")
+        logger.debug("Not enough data to calculate MACD.")
         return float('nan')
     return macd_hist.iloc[-1]
 
-def calculate_sma_crossover(short_window: int, long_window: int, close_prices: pd.Series) -> float:
+def calculate_sma_crossover(
+    short_window: int,
+    long_window: int,
+    close_prices: Optional[pd.Series] = None,
+    state: Optional[IndicatorState] = None
+) -> float:
+    if state is not None:
+        return state.crossover('sma', short_window, long_window)
+
     if len(close_prices) < max(short_window, long_window):
-        print("Not enough data to calculate SMA crossover.")
+        logger.debug("Not enough data to calculate SMA crossover.")
         return 0.5  # Neutral by default
 
     sma_short = trend.SMAIndicator(close=close_prices, window=short_window).sma_indicator()
@@ -41,7 +65,7 @@ def calculate_sma_crossover(short_window: int, long_window: int, close_prices: p
 
     # Drop NaN values if any
     if sma_short.dropna().empty or sma_long.dropna().empty:
-        print("Not enough data to compute SMA values.")
+        logger.debug("Not enough data to compute SMA values.")
         return 0.5
     
     if sma_short.iloc[-2] < sma_long.iloc[-2] and sma_short.iloc[-1] > sma_long.iloc[-1]:
@@ -51,9 +75,17 @@ def calculate_sma_crossover(short_window: int, long_window: int, close_prices: p
     else:
         return 0.5
 
-def calculate_ema_crossover(short_window: int, long_window: int, close_prices: pd.Series) -> float:
+def calculate_ema_crossover(
+    short_window: int,
+    long_window: int,
+    close_prices: Optional[pd.Series] = None,
+    state: Optional[IndicatorState] = None
+) -> float:
+    if state is not None:
+        return state.crossover('ema', short_window, long_window)
+
     if len(close_prices) < max(short_window, long_window):
-        print("Not enough data to calculate EMA crossover.")
+        logger.debug("Not enough data to calculate EMA crossover.")
         return 0.5
 
     ema_short = trend.EMAIndicator(close=close_prices, window=short_window).ema_indicator()
@@ -61,7 +93,7 @@ def calculate_ema_crossover(short_window: int, long_window: int, close_prices: p
 
     # Drop NaN values if any
     if ema_short.dropna().empty or ema_long.dropna().empty:
-        print("Not enough data to compute EMA values.")
+        logger.debug("Not enough data to compute EMA values.")
         return 0.5
 
     if ema_short.iloc[-2] < ema_long.iloc[-2] and ema_short.iloc[-1] > ema_long.iloc[-1]:
@@ -73,7 +105,7 @@ def calculate_ema_crossover(short_window: int, long_window: int, close_prices: p
 
 def calculate_volume_spike(current_volume: float, average_volume: float, threshold: float = 3.0) -> float:
     if np.isnan(current_volume) or np.isnan(average_volume):
-        print("Volume data is invalid.")
+        logger.debug("Volume data is invalid.")
         return 0.0
 
     if current_volume >= threshold * average_volume:
@@ -97,7 +129,7 @@ def calculate_hist_score(hist_score: int, max_hist_score: int = 20) -> float:
     return min(hist_score / max_hist_score, 1.0)
 
 def get_total_score(
-    close_prices: pd.Series,
+    close_prices: Optional[pd.Series],
     current_volume: float,
     average_volume: float,
     sentiment: float,
@@ -111,32 +143,39 @@ def get_total_score(
     ema_long_window: int = 26,
     volume_threshold: float = 3.0,
     sentiment_threshold: float = 0.8,
-    hist_max_score: int = 20
+    hist_max_score: int = 20,
+    rsi_oversold: float = 30,
+    rsi_neutral: float = 50,
+    weights: Optional[dict] = None,
+    state: Optional[IndicatorState] = None
 ) -> float:
-    weights = {
-        'RSI': 0.15,
-        'MACD': 0.15,
-        'SMA_Crossover': 0.15,
-        'EMA_Crossover': 0.15,
-        'Volume_Spike': 0.15,
-        'Sentiment': 0.15,
-        'Historical': 0.10
-    }
-
-    latest_rsi = calculate_rsi(close_prices, window=rsi_window)
+    """
+    If `state` is given, RSI, MACD and the crossovers are read from the
+    streaming indicator state instead of being recomputed from `close_prices`.
+    `weights` overrides SCORE_WEIGHTS (e.g. with a parameter sweep result).
+    """
+    weights = weights or SCORE_WEIGHTS
+
+    if state is not None:
+        latest_rsi = state.rsi_value(rsi_window)
+        latest_rsi = latest_rsi if latest_rsi is not None else float('nan')
+        macd_hist = state.macd.hist if state.macd.hist is not None else float('nan')
+    else:
+        latest_rsi = calculate_rsi(close_prices, window=rsi_window)
+        macd_hist = calculate_macd(close_prices)
+
     if np.isnan(latest_rsi):
         rsi_score = 0.5  # Default neutral if RSI can't be calculated
     else:
-        rsi_score = 1.0 if latest_rsi < 30 else (0.5 if latest_rsi < 50 else 0.0)
+        rsi_score = 1.0 if latest_rsi < rsi_oversold else (0.5 if latest_rsi < rsi_neutral else 0.0)
 
-    macd_hist = calculate_macd(close_prices)
     if np.isnan(macd_hist):
         macd_score = 0.5
     else:
         macd_score = 1.0 if macd_hist > 0 else 0.0
 
-    sma_score = calculate_sma_crossover(short_window=sma_short_window, long_window=sma_long_window, close_prices=close_prices)
-    ema_score = calculate_ema_crossover(short_window=ema_short_window, long_window=ema_long_window, close_prices=close_prices)
+    sma_score = calculate_sma_crossover(short_window=sma_short_window, long_window=sma_long_window, close_prices=close_prices, state=state)
+    ema_score = calculate_ema_crossover(short_window=ema_short_window, long_window=ema_long_window, close_prices=close_prices, state=state)
     volume_spike_score = calculate_volume_spike(current_volume, average_volume, threshold=volume_threshold)
     sentiment_score = calculate_sentiment_score(sentiment, threshold=sentiment_threshold)
     hist_score_normalized = calculate_hist_score(hist_score, max_hist_score=hist_max_score)
@@ -162,32 +201,40 @@ def get_total_score(
     return total_score
 
 def mainscore(symbol,interval,limit):
-    client = Client()  # Public data, no need for API key
     interval = '1h'
     limit = 500
-    klines = client.get_klines(symbol=symbol, interval=interval, limit=limit)
-    df = pd.DataFrame(klines, columns=[
-        'open_time', 'open', 'high', 'low', 'close', 'volume',
-        'close_time', 'quote_asset_volume', 'number_of_trades',
-        'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-    ])
-    df['close'] = pd.to_numeric(df['close'], errors='coerce')
-    df['volume'] = pd.to_numeric(df['volume'], errors='coerce')
-
-    close_prices = df['close']
-    current_volume = df['volume'].iloc[-1] if len(df) > 0 else float('nan')
-    average_volume = df['volume'].mean() if len(df) > 0 else float('nan')
+    klines = get_store().get_klines(symbol=symbol, interval=interval, limit=limit)
+    return score_klines(symbol, interval, klines)
+
+async def mainscore_async(symbol, interval, limit):
+    """Non-blocking `mainscore` using the pooled async market client."""
+    interval = '1h'
+    limit = 500
+    klines = await get_async_client().get_klines(symbol=symbol, interval=interval, limit=limit)
+    return score_klines(symbol, interval, klines)
+
+def score_klines(symbol, interval, klines):
+    # Only candles closed since the last call are folded into the state; the
+    # still-open candle is applied to a throwaway copy.
+    state = get_indicator_book().advance(symbol, interval, klines)
+    if klines and klines[-1][6] >= time.time() * 1000:
+        state = state.peek(float(klines[-1][4]))
+
+    volumes = [float(k[5]) for k in klines]
+    current_volume = volumes[-1] if volumes else float('nan')
+    average_volume = sum(volumes) / len(volumes) if volumes else float('nan')
 
     sentiment = 0.85
     hist_score = 15
 
     total = get_total_score(
-        close_prices=close_prices,
+        close_prices=None,
         current_volume=current_volume,
         average_volume=average_volume,
         sentiment=sentiment,
-        hist_score=hist_score
+        hist_score=hist_score,
+        state=state
     )
 
-    print(f"Total indicators Score: {total:.2f}/100")
+    logger.debug("Total indicators Score: %.2f/100", total, extra={"coin": symbol, "stage": "indicators"})
     return float(total)
@@ -0,0 +1,154 @@
+"""
+Process-wide logging through a queue.
+
+`setup_logging` puts a single QueueHandler on the root logger, so a log call
+only formats the message and enqueues it; a QueueListener thread does the
+writing. Records carry optional structured fields passed as
+`extra={"coin": ..., "source": ..., "stage": ..., "latency": ...}`, which
+the formatter appends as key=value pairs (or JSON with LOG_FORMAT=json).
+
+Levels are set per logger with LOG_LEVELS, e.g.
+"indicators=WARNING,SOCIALBOTS.fbapi=DEBUG". Per-item debug lines pass
+`extra=sampled(...)` and only one in LOG_SAMPLE_EVERY of them is kept per
+call site. Calls below a logger's level return after a cached level check,
+so debug lines in hot loops cost almost nothing when debug is off.
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+
+FIELDS = ("coin", "source", "stage", "latency")
+
+
+def sampled(**fields):
+    """`extra` for a per-item line that should be sampled."""
+    fields["sampled"] = True
+    return fields
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps the first and then every `every`-th sampled record from each call site."""
+    def __init__(self, every=LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts = {}
+
+    def filter(self, record):
+        if not getattr(record, "sampled", False):
+            return True
+        site = (record.pathname, record.lineno)
+        count = self._counts.get(site, 0)
+        self._counts[site] = count + 1
+        if count % self.every:
+            return False
+        if self.every > 1:
+            record.msg = f"{record.msg} [1 in {self.every}]"
+        return True
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    QueueHandler that keeps the traceback apart from the message. The stock
+    `prepare` folds it into `msg`; here it goes to `exc_text`, which the
+    formatter writes after the line (or as "exc_info" in JSON).
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None  # Tracebacks can't be pickled or safely shared across threads
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    def __init__(self, fmt=LOG_FORMAT):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.json = fmt == "json"
+
+    def format(self, record):
+        fields = {name: getattr(record, name) for name in FIELDS if getattr(record, name, None) is not None}
+        if "latency" in fields:
+            fields["latency"] = round(fields["latency"], 3)
+        if self.json:
+            entry = {
+                "time": self.formatTime(record),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+                **fields,
+            }
+            exc_text = record.exc_text or (self.formatException(record.exc_info) if record.exc_info else None)
+            if exc_text:
+                entry["exc_info"] = exc_text
+            return json.dumps(entry, default=str)
+        line = super().format(record)
+        if fields:
+            line += " | " + " ".join(f"{name}={value}" for name, value in fields.items())
+        return line
+
+
+def parse_levels(spec):
+    """"a=DEBUG,b.c=WARNING" -> {"a": "DEBUG", "b.c": "WARNING"}"""
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.strip().partition("=")
+        if sep and name.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener = None
+_lock = threading.Lock()
+
+
+def setup_logging(level=LOG_LEVEL, levels=LOG_LEVELS, fmt=LOG_FORMAT, sample_every=LOG_SAMPLE_EVERY, stream=None):
+    """
+    Route all logging through a queue to one writer thread. Replaces any
+    handlers already on the root logger; safe to call more than once.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(StructuredFormatter(fmt))
+        handler = StructuredQueueHandler(queue.SimpleQueue())
+        handler.addFilter(SamplingFilter(sample_every))
+
+        root = logging.getLogger()
+        for old in root.handlers[:]:
+            root.removeHandler(old)
+        root.addHandler(handler)
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+        for name, module_level in (parse_levels(levels) if isinstance(levels, str) else levels).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def stop_logging():
+    """Write out every queued record and stop the writer thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(stop_logging)
@@ -3,26 +3,43 @@ import nest_asyncio
 import sqlite3
 import os
 import time
+import logging
 from datetime import datetime
 import requests
 from dotenv import load_dotenv
 from binance.client import Client
 from binance.enums import *
-from analysis import assess_historical_pattern
-from SOCIALBOTS.botsdump import sentiment_scores
+from analysis import assess_historical_pattern_async
+from SOCIALBOTS.botsdump import collect_social_snapshot, SocialSnapshot
 from decision import (
-    get_binance_data,
-    assess_price_volume,
+    assess_price_volume_async,
+    to_timestamp,
     calculate_trade_amount,
     decide_to_buy
 )
-from indicators import mainscore
+from indicators import mainscore_async
+from streamindicators import get_indicator_book
+from asyncmarket import get_async_client, close_async_client
+from marketdata import start_market_data, stop_market_data
+from tickersnapshot import get_snapshot
+from exchangeinfo import get_exchange_info_cache
 from execution import get_portfolio_balance, execute_trade, get_open_positions
-from SOCIALBOTS.telegrambot2 import send_notification
+from SOCIALBOTS.telegrambot2 import (
+    send_notification,
+    close_notifications,
+    start_telegram_ingestion,
+    stop_telegram_ingestion
+)
+from SOCIALBOTS.notifier import HIGH, LOW
+from SOCIALBOTS.browserpool import close_pools
+from SOCIALBOTS.redditbot import close_reddit_followers
+from logsetup import setup_logging
 
 nest_asyncio.apply()
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Binance testnet API keys
 API_KEY = os.getenv('TEST_API_KEY')
 API_SECRET = os.getenv('TEST_SECRET')
@@ -43,17 +60,10 @@ def synchronize_time(client: Client):
         time_offset = server_time['serverTime'] - local_time
         client.time_offset = time_offset
     except Exception as e:
-        print(f"Time sync error: {e}")
+        logger.error("Time sync error: %s", e)
 
 def get_market_precision(client: Client, symbol: str) -> int:
-    exchange_info = client.get_exchange_info()
-    for symbol_info in exchange_info['symbols']:
-        if symbol_info['symbol'] == symbol:
-            for f in symbol_info['filters']:
-                if f['filterType'] == 'LOT_SIZE':
-                    step_size = float(f['stepSize'])
-                    return len(str(step_size).split('.')[-1].rstrip('0'))
-    return 0
+    return get_exchange_info_cache(client).quantity_precision(symbol)
 
 def round_quantity(quantity: float, precision: int) -> float:
     return round(quantity, precision)
@@ -76,42 +86,42 @@ def get_top_100_coins():
             top_100.append(symbol)
         return top_100
     except Exception as e:
-        print(f"Error fetching coins from CoinMarketCap: {e}")
+        logger.error("Error fetching coins from CoinMarketCap: %s", e)
         return []
 
+def post_time_of(post):
+    """When the post driving a coin's signal was made; an example time if there is none."""
+    if post:
+        return post.get('date') or post.get('created_utc')
+    return "2024-12-08T12:00:00Z"  # example
+
 async def run_pump_detection_pipeline(
-    keywords: list,
-    subreddits: list,
+    snapshot: SocialSnapshot,
     coin_symbol: str,
     searchcoin: str,
-    group_id: str,
-    cookies_file: str,
-    fb_cookies: str
+    price_at_post_time: float = None
 ) -> dict:
     """
-    Detect possible pump signals for a specific coin.
+    Detect possible pump signals for a specific coin against this cycle's
+    social snapshot. `price_at_post_time` comes from the cycle's batched
+    lookup; it is fetched here when missing.
     """
     try:
         # Sentiment
-        sentiment_score, sentiment, influencial_post = await sentiment_scores(
-            keywords, subreddits, searchcoin, group_id, cookies_file, fb_cookies
-        )
+        sentiment_score, sentiment, influencial_post = snapshot.coin_sentiment(searchcoin)
+        duplicate_posts = snapshot.coin_duplicates(searchcoin)
         
-        if influencial_post:
-            engagement_score = influencial_post.get('engagement_score', 0)
-            post_time = influencial_post.get('date', 'created_utc')
-        else:
-            engagement_score = 0
-            post_time = "2024-12-08T12:00:00Z"  # example
+        engagement_score = influencial_post.get('engagement_score', 0) if influencial_post else 0
+        post_time = post_time_of(influencial_post)
 
         # Price & Volume
-        binance_price, price_change_percent, volume = get_binance_data(coin_symbol)
-        price_score, volume_score, price_increase, volume_spike = assess_price_volume(
-            post_time, coin_symbol
+        binance_price, price_change_percent, volume = await get_async_client().get_binance_data(coin_symbol)
+        price_score, volume_score, price_increase, volume_spike = await assess_price_volume_async(
+            post_time, coin_symbol, price_at_post_time
         )
 
         # Historical
-        historical_score = assess_historical_pattern()
+        historical_score = await assess_historical_pattern_async()
 
         return {
             "engagement_score": engagement_score,
@@ -127,11 +137,12 @@ async def run_pump_detection_pipeline(
             "sentiment_analysis": {
                 "sentiment_score": sentiment_score,
                 "sentiment": sentiment,
+                "duplicate_posts": duplicate_posts,
             },
             "historical_score": historical_score,
         }
     except Exception as e:
-        print(f"Error in pipeline for {coin_symbol}: {e}")
+        logger.error("Error in pipeline for %s: %s", coin_symbol, e, extra={"coin": coin_symbol, "stage": "pipeline"})
         return None
 
 def save_trade_to_db(db_path, symbol, side, amount, price, realized_pnl=0.0):
@@ -181,7 +192,7 @@ async def trade_execution(
     try:
         open_positions = 1 #get_open_positions(client) or 1
         if not isinstance(open_positions, (int, float)):
-            print("open_positions is not a number. Default to 0.")
+            logger.warning("open_positions is not a number. Default to 0.")
             open_positions = 1
 
         portfolio_balance = get_portfolio_balance(client, "USDT")
@@ -200,8 +211,8 @@ async def trade_execution(
         if can_buy:
             # Execute the buy trade
             order = execute_trade(client, trade_amount, coin_symbol)
-            print("Trade executed:", order)
-            await send_notification(f"Trade executed: {order}")
+            logger.info("Trade executed: %s", order, extra={"coin": coin_symbol, "stage": "trade"})
+            await send_notification(f"Trade executed: {order}", priority=HIGH)
 
             # Extract details to store in DB.
             # Here, we assume it's always a "BUY," but adapt for SELL if you do short trades.
@@ -218,13 +229,29 @@ async def trade_execution(
             save_trade_to_db(DB_PATH, traded_symbol, side, amount, price, realized_pnl=0.0)
 
         else:
-            await send_notification(f"No buy signal for {coin_symbol}.")
+            await send_notification(f"No buy signal for {coin_symbol}.", priority=LOW)
     except Exception as e:
-        print(f"Trade execution failed: {e}")
-        await send_notification(f"Trade execution failed: {e}")
+        logger.error("Trade execution failed: %s", e, extra={"coin": coin_symbol, "stage": "trade"})
+        await send_notification(f"Trade execution failed: {e}", priority=HIGH)
 
 import asyncio
 
+async def shutdown():
+    """Stop every background service; a failing step doesn't skip the others."""
+    steps = (
+        stop_market_data,
+        stop_telegram_ingestion,
+        lambda: asyncio.to_thread(close_pools),
+        close_reddit_followers,
+        close_notifications,  # Sends queued HIGH messages, e.g. trade fills
+        close_async_client,
+    )
+    for step in steps:
+        try:
+            await step()
+        except Exception as e:
+            logger.error("Shutdown step failed: %s", e, extra={"stage": "shutdown"})
+
 async def main():
     # Constants
     group_id = "565383300477194"
@@ -239,64 +266,107 @@ async def main():
     client = await initialize_testnet_client(API_KEY, API_SECRET)
     synchronize_time(client)
 
-    pumped_coins = {}
-    
-    print("Checking each coin for a pump signal. Please wait...")
-    
-    async def process_coin(symbol):
+    try:
+        # Live prices for the whole universe instead of per-coin ticker polling
+        market_data = await start_market_data([symbol + "USDT" for symbol in coin_list if symbol != "USDT"])
+        await market_data.wait_ready()
+
+        # One bulk ticker read shared by every coin in this cycle
         try:
-            coin_symbol = symbol + "USDT"
-            results = await run_pump_detection_pipeline(
-                coin_list, subreddits, coin_symbol, symbol, group_id, cookies_file, fb_cookies
-            )
-            if results:
-                total_score = mainscore(symbol=coin_symbol, interval="1h", limit=500)
-                price_increase = results["price_analysis"]["price_increase"]
-                if total_score > 10 or price_increase > 10:
-                    return {
-                        "symbol": symbol,
-                        "results": results,
-                        "total_score": total_score,
-                        "price_increase": price_increase,
-                    }
+            get_snapshot().refresh()
         except Exception as e:
-            print(f"Error processing {symbol}: {e}")
-        return None
+            logger.warning("Ticker snapshot refresh failed: %s", e)
 
-    # Process all coins concurrently
-    tasks = [process_coin(symbol) for symbol in coin_list]
-    results = await asyncio.gather(*tasks)
-    
-    # Filter out None results
-    pumped_coins = {res["symbol"]: res for res in results if res}
+        # Resident Telegram client; collect_social_snapshot reads its buffer
+        try:
+            await start_telegram_ingestion()
+        except Exception as e:
+            logger.warning("Telegram ingestion unavailable, falling back to per-cycle reads: %s", e)
 
-    if not pumped_coins:
-        print("No pumps detected.")
-        return
+        # Social posts are collected once per cycle and shared by every coin
+        logger.info("Collecting social posts...")
+        snapshot = await collect_social_snapshot(coin_list, subreddits, group_id, cookies_file, fb_cookies)
+        snapshot.index_coins(coin_list)
 
-    print("Pumped coins found:")
-    for coin in pumped_coins:
-        print(f" - {coin}")
+        pumped_coins = {}
     
-    # Auto-trade concurrently
-    async def auto_trade(symbol, coin_data):
+        logger.info("Checking each coin for a pump signal. Please wait...")
+
+        # Every coin's post-time price in one batched lookup instead of one request per coin
+        post_prices = {}
         try:
-            coin_symbol = symbol + "USDT"
-            print(f"\nAuto-trading for {coin_symbol} ...")
-            await trade_execution(
-                client,
-                coin_data["results"]["historical_score"],
-                coin_data["total_score"],
-                coin_symbol,
-                coin_data["price_increase"],
-            )
+            pairs = [(symbol + "USDT", to_timestamp(post_time_of(snapshot.top_post(symbol)))) for symbol in coin_list]
+            post_prices = dict(zip(coin_list, await get_async_client().get_prices_at_times(pairs)))
         except Exception as e:
-            print(f"Error auto-trading {symbol}: {e}")
+            logger.warning("Batched post-time price lookup failed: %s", e, extra={"stage": "price_volume"})
+    
+        async def process_coin(symbol):
+            started = time.monotonic()
+            try:
+                coin_symbol = symbol + "USDT"
+                results = await run_pump_detection_pipeline(snapshot, coin_symbol, symbol, post_prices.get(symbol))
+                if results:
+                    total_score = await mainscore_async(symbol=coin_symbol, interval="1h", limit=500)
+                    price_increase = results["price_analysis"]["price_increase"]
+                    logger.debug("Score %.2f, price increase %.2f%%", total_score, price_increase,
+                                 extra={"coin": symbol, "stage": "pump_check", "latency": time.monotonic() - started})
+                    if total_score > 10 or price_increase > 10:
+                        return {
+                            "symbol": symbol,
+                            "results": results,
+                            "total_score": total_score,
+                            "price_increase": price_increase,
+                        }
+            except Exception as e:
+                logger.error("Error processing %s: %s", symbol, e, extra={"coin": symbol, "stage": "pump_check"})
+            return None
+
+        # Process all coins concurrently
+        tasks = [process_coin(symbol) for symbol in coin_list]
+        results = await asyncio.gather(*tasks)
+
+        # Carry the decayed per-coin sentiment and indicator state over to the next run
+        try:
+            await asyncio.to_thread(snapshot.aggregates.save)
+        except Exception as e:
+            logger.warning("Saving coin sentiment failed: %s", e)
+        try:
+            await asyncio.to_thread(get_indicator_book().save)
+        except Exception as e:
+            logger.warning("Saving indicator state failed: %s", e)
+    
+        # Filter out None results
+        pumped_coins = {res["symbol"]: res for res in results if res}
+
+        if not pumped_coins:
+            logger.info("No pumps detected.")
+            return
 
-    trade_tasks = [auto_trade(symbol, data) for symbol, data in pumped_coins.items()]
-    await asyncio.gather(*trade_tasks)
+        logger.info("Pumped coins found: %s", ", ".join(pumped_coins))
+    
+        # Auto-trade concurrently
+        async def auto_trade(symbol, coin_data):
+            try:
+                coin_symbol = symbol + "USDT"
+                logger.info("Auto-trading for %s ...", coin_symbol, extra={"coin": coin_symbol, "stage": "trade"})
+                await trade_execution(
+                    client,
+                    coin_data["results"]["historical_score"],
+                    coin_data["total_score"],
+                    coin_symbol,
+                    coin_data["price_increase"],
+                )
+            except Exception as e:
+                logger.error("Error auto-trading %s: %s", symbol, e, extra={"coin": symbol, "stage": "trade"})
+
+        trade_tasks = [auto_trade(symbol, data) for symbol, data in pumped_coins.items()]
+        await asyncio.gather(*trade_tasks)
+
+        logger.info("Done auto-trading all pumped coins!")
+    finally:
+        await shutdown()
 
-    print("Done auto-trading all pumped coins!")
 
 if __name__ == "__main__":
+    setup_logging()
     asyncio.run(main())
@@ -0,0 +1,239 @@
+"""
+Live market data over Binance combined WebSocket streams.
+
+One background task per connection subscribes to `<symbol>@miniTicker` and
+`<symbol>@kline_<interval>` for the scanned universe and keeps an in-memory
+ticker table (last price, 24h change, 24h volume). Kline updates are
+buffered and written to the shared candle store in batches from a worker
+thread, so the socket readers never wait on SQLite. Connections reconnect
+with backoff and resync the table from a REST snapshot after every
+(re)connect.
+
+The WebSocket and REST base URLs are configurable, so the stream can be run
+against a local stand-in server.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import requests
+import websockets
+from candlestore import get_store
+
+logger = logging.getLogger(__name__)
+
+MARKET_WS_URL = os.getenv("MARKET_WS_URL", "wss://stream.binance.com:9443")
+MARKET_REST_URL = os.getenv("MARKET_REST_URL", "https://api.binance.com")
+MAX_STREAMS_PER_CONNECTION = 200  # Binance allows 1024; smaller chunks reconnect faster
+MAX_RECONNECT_DELAY = 60
+KLINE_FLUSH_INTERVAL = 1.0  # seconds between batched candle store writes
+MARKET_DATA_MAX_AGE = float(os.getenv("MARKET_DATA_MAX_AGE", "30"))  # seconds before a ticker entry is stale
+
+
+class MarketDataStream:
+    def __init__(
+        self,
+        symbols: list,
+        interval: str = "1h",
+        ws_url: str = MARKET_WS_URL,
+        rest_url: str = MARKET_REST_URL,
+        store=None,
+        resync: bool = True
+    ):
+        self.symbols = [s.upper() for s in symbols]
+        self.interval = interval
+        self.ws_url = ws_url.rstrip("/")
+        self.rest_url = rest_url.rstrip("/")
+        self.store = store
+        self.resync = resync
+        self.tickers = {}        # symbol -> latest ticker fields
+        self.connected = set()   # indexes of the connections currently open
+        self._tasks = []
+        self._pending = {}       # (symbol, interval) -> {open_time: kline row} not yet stored
+        self._flusher = None
+
+    # ---- lifecycle ----
+
+    def _chunks(self):
+        """Symbols per connection; each symbol contributes two streams."""
+        per_connection = MAX_STREAMS_PER_CONNECTION // 2
+        return [self.symbols[i:i + per_connection] for i in range(0, len(self.symbols), per_connection)]
+
+    def _url(self, symbols):
+        streams = []
+        for symbol in symbols:
+            streams.append(f"{symbol.lower()}@miniTicker")
+            streams.append(f"{symbol.lower()}@kline_{self.interval}")
+        return f"{self.ws_url}/stream?streams={'/'.join(streams)}"
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run(index, symbols))
+                for index, symbols in enumerate(self._chunks())
+            ]
+            self._flusher = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def stop(self):
+        tasks = self._tasks + ([self._flusher] if self._flusher else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._flusher = None
+        self.connected.clear()
+        await asyncio.to_thread(self.flush_klines)
+
+    async def wait_ready(self, timeout: float = 10.0):
+        """Wait until every connection is open; returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while len(self.connected) < len(self._tasks):
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def _run(self, index, symbols):
+        url = self._url(symbols)
+        delay = 1
+        while True:
+            try:
+                async with websockets.connect(url, ping_interval=20, ping_timeout=20) as ws:
+                    self.connected.add(index)
+                    delay = 1
+                    if self.resync:
+                        await self._resync(symbols)
+                    async for raw in ws:
+                        self.handle_message(json.loads(raw))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Market data connection %d dropped: %s. Reconnecting in %ds", index, e, delay,
+                               extra={"source": "market_stream", "stage": "connect"})
+            finally:
+                self.connected.discard(index)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _resync(self, symbols):
+        """Refill the ticker table from one REST snapshot after a (re)connect."""
+        try:
+            data = await asyncio.to_thread(self._fetch_snapshot, symbols)
+        except Exception as e:
+            logger.warning("Market data resync failed: %s", e, extra={"source": "market_stream", "stage": "resync"})
+            return
+        for item in data:
+            entry = self.tickers.get(item["symbol"])
+            if entry and entry["event_time"] >= item["closeTime"]:
+                continue  # The stream already delivered something newer
+            self.tickers[item["symbol"]] = {
+                "last_price": float(item["lastPrice"]),
+                "open_price": float(item["openPrice"]),
+                "price_change_percent": float(item["priceChangePercent"]),
+                "volume": float(item["volume"]),
+                "quote_volume": float(item["quoteVolume"]),
+                "event_time": item["closeTime"],
+                "received_at": time.time(),
+            }
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(KLINE_FLUSH_INTERVAL)
+            try:
+                await asyncio.to_thread(self.flush_klines)
+            except Exception as e:
+                logger.warning("Storing streamed klines failed: %s", e, extra={"source": "market_stream", "stage": "klines"})
+
+    def flush_klines(self):
+        """Write the buffered kline updates to the candle store (blocking; run off the loop)."""
+        pending, self._pending = self._pending, {}
+        store = self.store or get_store()
+        for (symbol, interval), rows in pending.items():
+            store.add_klines(symbol, interval, [rows[t] for t in sorted(rows)])
+
+    def _fetch_snapshot(self, symbols):
+        response = requests.get(
+            f"{self.rest_url}/api/v3/ticker/24hr",
+            params={"symbols": json.dumps(symbols, separators=(",", ":"))}
+        )
+        if response.status_code == 400 and _error_code(response) == -1121:
+            # One unlisted symbol (e.g. USDTUSDT) rejects the whole call; read
+            # every ticker instead and keep the ones this connection streams.
+            response = requests.get(f"{self.rest_url}/api/v3/ticker/24hr")
+            if response.status_code == 200:
+                wanted = set(symbols)
+                return [item for item in response.json() if item["symbol"] in wanted]
+        if response.status_code != 200:
+            raise ValueError(f"Failed to fetch ticker snapshot: {response.text}")
+        return response.json()
+
+    # ---- messages ----
+
+    def handle_message(self, message: dict):
+        data = message.get("data", message)
+        event = data.get("e")
+        if event == "24hrMiniTicker":
+            last_price = float(data["c"])
+            open_price = float(data["o"])
+            self.tickers[data["s"]] = {
+                "last_price": last_price,
+                "open_price": open_price,
+                "price_change_percent": (last_price - open_price) / open_price * 100 if open_price else 0.0,
+                "volume": float(data["v"]),
+                "quote_volume": float(data["q"]),
+                "event_time": data["E"],
+                "received_at": time.time(),
+            }
+        elif event == "kline":
+            k = data["k"]
+            row = [k["t"], k["o"], k["h"], k["l"], k["c"], k["v"], k["T"], k["q"], k["n"], k["V"], k["Q"], "0"]
+            # Later updates of the same candle replace earlier ones before the flush
+            self._pending.setdefault((data["s"], k["i"]), {})[k["t"]] = row
+
+    # ---- reads ----
+
+    def get_ticker(self, symbol: str, max_age: float = None):
+        """
+        (current_price, price_change_percent, volume) like
+        `decision.get_binance_data`, or None if the symbol has no fresh entry.
+        """
+        entry = self.tickers.get(symbol)
+        if entry is None:
+            return None
+        if max_age is not None and time.time() - entry["received_at"] > max_age:
+            return None
+        return entry["last_price"], entry["price_change_percent"], entry["volume"]
+
+
+def _error_code(response):
+    """Binance error code from an error response body, or None."""
+    try:
+        return response.json().get("code")
+    except (ValueError, AttributeError):
+        return None
+
+
+_default_stream = None
+
+
+async def start_market_data(symbols: list, interval: str = "1h") -> MarketDataStream:
+    """Start the process-wide market data stream used by `decision.get_binance_data`."""
+    global _default_stream
+    if _default_stream is not None:
+        await _default_stream.stop()
+    _default_stream = MarketDataStream(symbols, interval=interval)
+    await _default_stream.start()
+    return _default_stream
+
+
+async def stop_market_data():
+    global _default_stream
+    if _default_stream is not None:
+        await _default_stream.stop()
+        _default_stream = None
+
+
+def get_market_data():
+    return _default_stream
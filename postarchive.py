@@ -0,0 +1,199 @@
+"""
+Append-only archive of collected social posts.
+
+Posts are stored as gzip-compressed JSON lines, one file per UTC day
+(`posts-YYYYMMDD.jsonl.gz`). Every append writes one gzip member per source,
+and a sidecar index (`posts-YYYYMMDD.idx`) records each member's byte range,
+source, post count and time span. Readers use the index to seek straight to
+the batches they need and decompress them one at a time, so months of posts
+can be replayed in constant memory.
+"""
+import os
+import json
+import gzip
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+POST_ARCHIVE_DIR = os.getenv("POST_ARCHIVE_DIR", "POSTDATA")
+RECENT_KEYS = 100000  # posts remembered to skip re-archiving the same post
+RECENT_DAYS = 2  # archive days (today and yesterday, UTC) reloaded into the LRU at startup
+
+# Fields that identify a post; engagement counts change between reads and are left out
+IDENTITY_FIELDS = ("id", "post_id", "group_id", "sender_id", "date", "created_utc", "title", "message", "Tweet")
+
+
+def post_key(source: str, post: dict) -> bytes:
+    identity = [source] + [post.get(field) for field in IDENTITY_FIELDS]
+    return hashlib.blake2b(json.dumps(identity, default=str).encode("utf-8"), digest_size=16).digest()
+
+
+def post_timestamp(post: dict, default: float) -> float:
+    """UNIX time a post was made, from whichever field its source provides."""
+    created = post.get("created_utc")
+    if created is not None:
+        return float(created)
+    date = post.get("date")
+    if date:
+        try:
+            parsed = datetime.fromisoformat(str(date).replace("Z", "+00:00"))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed.timestamp()
+        except ValueError:
+            pass
+    return default
+
+
+class PostArchive:
+    def __init__(self, root: str = POST_ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()  # post_key -> None, LRU of archived posts
+        os.makedirs(root, exist_ok=True)
+        self._load_recent()
+
+    def _paths(self, day: str):
+        base = os.path.join(self.root, f"posts-{day}")
+        return base + ".jsonl.gz", base + ".idx"
+
+    def _load_recent(self, days: int = RECENT_DAYS):
+        """
+        Seed the LRU with the posts of the last `days` archive files, so a new
+        process does not archive again the window its sources re-serve.
+        """
+        now = time.time()
+        wanted = {datetime.fromtimestamp(now - i * 86400, timezone.utc).strftime("%Y%m%d") for i in range(days)}
+        for day in self.days():
+            if day not in wanted:
+                continue
+            for entry in self._day_batches(day):
+                try:
+                    records = list(self._batch_records(entry))
+                except (OSError, EOFError, ValueError):
+                    continue  # Unreadable batch; at worst its posts are archived again
+                for record in records:
+                    self._recent[post_key(record["source"], record["post"])] = None
+        while len(self._recent) > RECENT_KEYS:
+            self._recent.popitem(last=False)
+
+    def _unseen(self, source, posts):
+        """Posts not archived recently; sources re-serve their recent window every cycle."""
+        fresh = []
+        with self._lock:
+            for post in posts:
+                key = post_key(source, post)
+                if key in self._recent:
+                    self._recent.move_to_end(key)
+                    continue
+                self._recent[key] = None
+                fresh.append(post)
+            while len(self._recent) > RECENT_KEYS:
+                self._recent.popitem(last=False)
+        return fresh
+
+    def append(self, source: str, posts: list, collected_at: float = None) -> int:
+        """Archive `posts` from `source` as one compressed batch; returns the count written."""
+        posts = self._unseen(source, posts)
+        if not posts:
+            return 0
+        collected_at = collected_at or time.time()
+        records = [
+            {"source": source, "ts": post_timestamp(post, collected_at), "collected_at": collected_at, "post": post}
+            for post in posts
+        ]
+        payload = gzip.compress(
+            "".join(json.dumps(record, default=str) + "\n" for record in records).encode("utf-8")
+        )
+        day = datetime.fromtimestamp(collected_at, timezone.utc).strftime("%Y%m%d")
+        data_path, index_path = self._paths(day)
+
+        with self._lock:
+            with open(data_path, "ab") as f:
+                offset = f.tell()
+                f.write(payload)
+            # The index line goes last: a crash in between leaves unindexed bytes, never a bad entry
+            with open(index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "offset": offset,
+                    "length": len(payload),
+                    "source": source,
+                    "count": len(records),
+                    "min_ts": min(r["ts"] for r in records),
+                    "max_ts": max(r["ts"] for r in records),
+                    "collected_at": collected_at,
+                }) + "\n")
+        return len(records)
+
+    def days(self) -> list:
+        """Archived days (YYYYMMDD), oldest first."""
+        return sorted(
+            name[len("posts-"):-len(".idx")]
+            for name in os.listdir(self.root)
+            if name.startswith("posts-") and name.endswith(".idx")
+        )
+
+    def batches(self, start: float = None, end: float = None, sources=None):
+        """Index entries (with their day) whose post times overlap [start, end]."""
+        sources = set(sources) if sources else None
+        for day in self.days():
+            for entry in self._day_batches(day):
+                if sources and entry["source"] not in sources:
+                    continue
+                if start is not None and entry["max_ts"] < start:
+                    continue
+                if end is not None and entry["min_ts"] > end:
+                    continue
+                yield entry
+
+    def _day_batches(self, day: str):
+        _, index_path = self._paths(day)
+        with open(index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line after a crash
+                entry["day"] = day
+                yield entry
+
+    def _batch_records(self, entry: dict):
+        data_path, _ = self._paths(entry["day"])
+        with open(data_path, "rb") as f:
+            f.seek(entry["offset"])
+            lines = gzip.decompress(f.read(entry["length"])).decode("utf-8").splitlines()
+        for line in lines:
+            yield json.loads(line)
+
+    def read(self, start: float = None, end: float = None, sources=None):
+        """
+        Stream archived records ({"source", "ts", "collected_at", "post"}) with
+        `start <= ts <= end`, batch by batch in the order they were archived.
+        """
+        for entry in self.batches(start, end, sources):
+            for record in self._batch_records(entry):
+                if start is not None and record["ts"] < start:
+                    continue
+                if end is not None and record["ts"] > end:
+                    continue
+                yield record
+
+    def read_posts(self, start: float = None, end: float = None, sources=None):
+        """Just the post dicts of `read`."""
+        for record in self.read(start, end, sources):
+            yield record["post"]
+
+
+_default_archive = None
+_default_lock = threading.Lock()
+
+
+def get_archive():
+    """Return the process-wide PostArchive."""
+    global _default_archive
+    with _default_lock:
+        if _default_archive is None:
+            _default_archive = PostArchive()
+        return _default_archive
@@ -0,0 +1,99 @@
+"""
+Shared VADER sentiment scoring.
+
+The analyzer (and its lexicon) is loaded once per process. Scores are cached
+by a hash of the whitespace-normalized text with LRU eviction, so posts that
+come back cycle after cycle, or are reposted verbatim, are scored only once.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import nltk
+
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "50000"))
+
+
+def normalize_text(text: str) -> str:
+    # Case and punctuation are left alone: VADER scores capitals and "!!!" as emphasis.
+    return " ".join(str(text or "").split())
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).digest()
+
+
+class SentimentService:
+    def __init__(self, cache_size: int = SENTIMENT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._analyzer = None
+        self._cache = OrderedDict()  # text key -> sentiment in [0, 1]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def analyzer(self):
+        if self._analyzer is None:
+            with self._lock:
+                if self._analyzer is None:
+                    try:
+                        nltk.data.find('sentiment/vader_lexicon.zip')
+                    except LookupError:
+                        nltk.download('vader_lexicon')
+                    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+                    self._analyzer = SentimentIntensityAnalyzer()
+        return self._analyzer
+
+    def score(self, text: str) -> float:
+        """VADER compound score of `text` mapped from [-1, 1] to [0, 1]."""
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts: list) -> list:
+        """Scores for `texts` in order; each distinct text is analyzed at most once."""
+        keys = [text_key(text) for text in texts]
+        results = {}
+        pending = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in results or key in pending:
+                    continue
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[key] = self._cache[key]
+                    self.hits += 1
+                else:
+                    pending[key] = text
+                    self.misses += 1
+
+        analyzer = self.analyzer if pending else None
+        for key, text in pending.items():
+            compound = analyzer.polarity_scores(normalize_text(text))['compound']
+            results[key] = (compound + 1) / 2.0
+
+        if pending:
+            with self._lock:
+                for key in pending:
+                    self._cache[key] = results[key]
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return [results[key] for key in keys]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def get_sentiment_service():
+    """Return the process-wide SentimentService."""
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = SentimentService()
+        return _default_service
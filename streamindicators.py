@@ -0,0 +1,357 @@
+"""
+Stateful streaming indicators.
+
+Each indicator keeps just enough state to fold in one closed candle in O(1)
+and follows the same recursions as the `ta` classes used by indicators.py
+(EWM with adjust=False seeded at the first close), so once warmed up the
+values agree with a full recompute. State serializes to JSON so a restart
+only has to replay the candles closed since the last save.
+"""
+import os
+import json
+import copy
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+INDICATOR_STATE_PATH = os.getenv("INDICATOR_STATE_PATH", "indicator_state.json")
+
+
+class StreamingEMA:
+    def __init__(self, window: int, alpha: float = None):
+        self.window = window
+        self.alpha = alpha if alpha is not None else 2.0 / (window + 1)
+        self.state = None
+        self.count = 0
+
+    def update(self, x: float):
+        self.state = x if self.state is None else self.state + self.alpha * (x - self.state)
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self):
+        return self.state if self.count >= self.window else None
+
+    def to_dict(self):
+        return {"window": self.window, "alpha": self.alpha, "state": self.state, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data):
+        ema = cls(data["window"], data["alpha"])
+        ema.state = data["state"]
+        ema.count = data["count"]
+        return ema
+
+
+class StreamingSMA:
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self._since_resum = 0
+
+    def update(self, x: float):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(x)
+        self.total += x
+        self._since_resum += 1
+        if self._since_resum >= self.window:
+            # Re-sum once per window to stop floating point drift; amortized O(1).
+            self.total = sum(self.values)
+            self._since_resum = 0
+        return self.value
+
+    @property
+    def value(self):
+        return self.total / self.window if len(self.values) == self.window else None
+
+    def to_dict(self):
+        return {"window": self.window, "values": list(self.values)}
+
+    @classmethod
+    def from_dict(cls, data):
+        sma = cls(data["window"])
+        for x in data["values"]:
+            sma.values.append(x)
+        sma.total = sum(sma.values)
+        return sma
+
+
+class StreamingRSI:
+    """Wilder RSI, matching `momentum.RSIIndicator`."""
+
+    def __init__(self, window: int = 14):
+        self.window = window
+        self.prev_close = None
+        self.avg_gain = StreamingEMA(window, alpha=1.0 / window)
+        self.avg_loss = StreamingEMA(window, alpha=1.0 / window)
+
+    def update(self, close: float):
+        diff = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        self.avg_gain.update(diff if diff > 0 else 0.0)
+        self.avg_loss.update(-diff if diff < 0 else 0.0)
+        return self.value
+
+    @property
+    def value(self):
+        gain, loss = self.avg_gain.value, self.avg_loss.value
+        if loss is None:
+            return None
+        if loss == 0:
+            return 100.0
+        return 100 - (100 / (1 + gain / loss))
+
+    def to_dict(self):
+        return {
+            "window": self.window,
+            "prev_close": self.prev_close,
+            "avg_gain": self.avg_gain.to_dict(),
+            "avg_loss": self.avg_loss.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        rsi = cls(data["window"])
+        rsi.prev_close = data["prev_close"]
+        rsi.avg_gain = StreamingEMA.from_dict(data["avg_gain"])
+        rsi.avg_loss = StreamingEMA.from_dict(data["avg_loss"])
+        return rsi
+
+
+class StreamingMACD:
+    """MACD histogram, matching `trend.MACD(...).macd_diff()`."""
+
+    def __init__(self, window_fast: int = 12, window_slow: int = 26, window_sign: int = 9):
+        self.fast = StreamingEMA(window_fast)
+        self.slow = StreamingEMA(window_slow)
+        self.signal = StreamingEMA(window_sign)
+        self.macd = None
+
+    def update(self, close: float):
+        fast, slow = self.fast.update(close), self.slow.update(close)
+        if fast is not None and slow is not None:
+            self.macd = fast - slow
+            self.signal.update(self.macd)
+        return self.hist
+
+    @property
+    def hist(self):
+        signal = self.signal.value
+        return None if signal is None else self.macd - signal
+
+    def to_dict(self):
+        return {
+            "fast": self.fast.to_dict(),
+            "slow": self.slow.to_dict(),
+            "signal": self.signal.to_dict(),
+            "macd": self.macd,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        macd = cls()
+        macd.fast = StreamingEMA.from_dict(data["fast"])
+        macd.slow = StreamingEMA.from_dict(data["slow"])
+        macd.signal = StreamingEMA.from_dict(data["signal"])
+        macd.macd = data["macd"]
+        return macd
+
+
+class StreamingCrossover:
+    """
+    Remembers the previous short/long relation (-1 below, 0 equal, 1 above) and
+    scores the latest candle like `calculate_*_crossover`: 1.0 bullish cross,
+    0.0 bearish cross, 0.5 otherwise.
+    """
+
+    def __init__(self, short_window: int, long_window: int):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.prev_relation = None
+        self.relation = None
+
+    def update(self, short_value, long_value):
+        self.prev_relation = self.relation
+        if short_value is None or long_value is None:
+            self.relation = None
+        else:
+            self.relation = (short_value > long_value) - (short_value < long_value)
+        return self.score
+
+    @property
+    def score(self):
+        if self.prev_relation == -1 and self.relation == 1:
+            return 1.0
+        if self.prev_relation == 1 and self.relation == -1:
+            return 0.0
+        return 0.5
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        cross = cls(data["short_window"], data["long_window"])
+        cross.prev_relation = data["prev_relation"]
+        cross.relation = data["relation"]
+        return cross
+
+
+class IndicatorState:
+    """
+    Everything `get_total_score` needs from the close series, for one
+    (symbol, interval), updated once per closed candle.
+    """
+
+    def __init__(
+        self,
+        rsi_window: int = 14,
+        sma_short_window: int = 20,
+        sma_long_window: int = 50,
+        ema_short_window: int = 12,
+        ema_long_window: int = 26
+    ):
+        self.rsi = StreamingRSI(rsi_window)
+        self.macd = StreamingMACD()
+        self.sma_short = StreamingSMA(sma_short_window)
+        self.sma_long = StreamingSMA(sma_long_window)
+        self.ema_short = StreamingEMA(ema_short_window)
+        self.ema_long = StreamingEMA(ema_long_window)
+        self.sma_cross = StreamingCrossover(sma_short_window, sma_long_window)
+        self.ema_cross = StreamingCrossover(ema_short_window, ema_long_window)
+        self.last_close_time = None
+
+    def update(self, close: float, close_time: int = None):
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.sma_cross.update(self.sma_short.update(close), self.sma_long.update(close))
+        self.ema_cross.update(self.ema_short.update(close), self.ema_long.update(close))
+        if close_time is not None:
+            self.last_close_time = close_time
+        return self
+
+    def peek(self, close: float):
+        """State as if `close` were the next candle, without changing this one."""
+        return copy.deepcopy(self).update(close)
+
+    def rsi_value(self, window: int):
+        """Latest RSI (None until it has data); the state only tracks one window."""
+        if self.rsi.window != window:
+            raise ValueError(f"Indicator state tracks RSI {self.rsi.window}, not {window}")
+        return self.rsi.value
+
+    def crossover(self, kind: str, short_window: int, long_window: int) -> float:
+        cross = self.sma_cross if kind == 'sma' else self.ema_cross
+        if (cross.short_window, cross.long_window) != (short_window, long_window):
+            raise ValueError(
+                f"Indicator state tracks {kind.upper()} {cross.short_window}/{cross.long_window}, "
+                f"not {short_window}/{long_window}"
+            )
+        return cross.score
+
+    def to_dict(self):
+        return {
+            "rsi": self.rsi.to_dict(),
+            "macd": self.macd.to_dict(),
+            "sma_short": self.sma_short.to_dict(),
+            "sma_long": self.sma_long.to_dict(),
+            "ema_short": self.ema_short.to_dict(),
+            "ema_long": self.ema_long.to_dict(),
+            "sma_cross": self.sma_cross.to_dict(),
+            "ema_cross": self.ema_cross.to_dict(),
+            "last_close_time": self.last_close_time,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.rsi = StreamingRSI.from_dict(data["rsi"])
+        state.macd = StreamingMACD.from_dict(data["macd"])
+        state.sma_short = StreamingSMA.from_dict(data["sma_short"])
+        state.sma_long = StreamingSMA.from_dict(data["sma_long"])
+        state.ema_short = StreamingEMA.from_dict(data["ema_short"])
+        state.ema_long = StreamingEMA.from_dict(data["ema_long"])
+        state.sma_cross = StreamingCrossover.from_dict(data["sma_cross"])
+        state.ema_cross = StreamingCrossover.from_dict(data["ema_cross"])
+        state.last_close_time = data["last_close_time"]
+        return state
+
+
+class IndicatorBook:
+    """
+    IndicatorState per (symbol, interval), persisted to a JSON file.
+    `advance` only marks the book dirty; `save` writes it once per cycle
+    (and at exit), so advancing a coin never rewrites every symbol's state.
+    """
+
+    def __init__(self, path=INDICATOR_STATE_PATH):
+        self.path = path
+        self.states = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.states = {k: IndicatorState.from_dict(v) for k, v in json.load(f).items()}
+            except (ValueError, KeyError) as e:
+                logger.warning("Ignoring unreadable indicator state %s: %s", path, e, extra={"stage": "indicators"})
+
+    def advance(self, symbol: str, interval: str, klines: list) -> IndicatorState:
+        """
+        Fold the closed klines newer than the stored state into it. If the
+        state is missing or no longer lines up with `klines`, it is rebuilt
+        from them once.
+        """
+        key = f"{symbol}:{interval}"
+        now_ms = int(time.time() * 1000)
+        closed = [k for k in klines if k[6] < now_ms]
+        with self._lock:
+            state = self.states.get(key)
+            if state is not None and state.last_close_time is not None:
+                new = [k for k in closed if k[6] > state.last_close_time]
+                if new and new[0][0] != state.last_close_time + 1:
+                    state = None  # Missed candles; rebuild
+            if state is None:
+                state = IndicatorState()
+                new = closed
+            for k in new:
+                state.update(float(k[4]), close_time=k[6])
+            self.states[key] = state
+            if new:
+                self.dirty = True
+            return state
+
+    def save(self):
+        """Write the states if any changed since the last save."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self.dirty:
+                return
+            data = {k: v.to_dict() for k, v in self.states.items()}
+            self.dirty = False
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+_default_book = None
+_default_lock = threading.Lock()
+
+
+def get_indicator_book():
+    """Return the process-wide IndicatorBook used by `indicators.mainscore`."""
+    global _default_book
+    with _default_lock:
+        if _default_book is None:
+            _default_book = IndicatorBook()
+            atexit.register(_default_book.save)
+        return _default_book
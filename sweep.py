@@ -0,0 +1,215 @@
+"""
+Parallel parameter sweep over the scoring weights and decision thresholds.
+
+Candles are loaded once and copied into shared memory; every worker process
+attaches to the same buffers read-only instead of receiving its own pickled
+copy, replays its share of parameter sets through `backtest.run_backtest` and
+returns the metrics. Indicator matrices are computed once per worker and the
+score thresholds are applied on top of them; only the component scores of the
+current (sorted) parameter key are kept, along with the historical pump
+scores, so sets that only change weights or decision thresholds cost a
+reweighting and the trade loop.
+
+A parameter space maps names to candidate values:
+- SCORE_WEIGHTS keys ('RSI', 'MACD', ...) override single weights; the
+  weights are renormalized to sum to 1 so totals stay in [0, 100].
+- SCORE_PARAMS are passed to `get_score_components_matrix`.
+- Anything else ('score_threshold', 'take_profit', ...) goes to `run_backtest`.
+"""
+import os
+import time
+import random
+import itertools
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from indicators import SCORE_WEIGHTS
+from batchindicators import get_score_components_matrix
+from backtest import load_candles, run_backtest, FIELDS
+
+SCORE_PARAMS = (
+    "volume_window", "rsi_window", "macd_window_short", "macd_window_long",
+    "sma_short_window", "sma_long_window", "ema_short_window", "ema_long_window",
+    "volume_threshold", "sentiment_threshold", "hist_max_score",
+    "rsi_oversold", "rsi_neutral"
+)
+
+DEFAULT_SPACE = {
+    "RSI": [0.10, 0.15, 0.20],
+    "MACD": [0.10, 0.15, 0.20],
+    "Volume_Spike": [0.10, 0.15, 0.25],
+    "Sentiment": [0.10, 0.15],
+    "rsi_oversold": [25, 30, 35],
+    "volume_threshold": [2.0, 3.0, 4.0],
+    "sentiment_threshold": [0.7, 0.8],
+    "score_threshold": [60, 65, 70, 75],
+    "hist_score_threshold": [0, 10],
+}
+
+
+def grid(space: dict) -> list:
+    """Every combination of the values in `space`."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_samples(space: dict, n: int, seed: int = None) -> list:
+    """
+    `n` random parameter sets. A list is sampled uniformly by item; a
+    (low, high) tuple is sampled uniformly between its bounds.
+    """
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(n):
+        params = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                params[name] = rng.uniform(*values)
+            else:
+                params[name] = rng.choice(values)
+        samples.append(params)
+    return samples
+
+
+def split_params(params: dict):
+    """(weights, score_kwargs, run_kwargs) for one parameter set."""
+    weights = dict(SCORE_WEIGHTS)
+    score_kwargs = {}
+    run_kwargs = {}
+    for name, value in params.items():
+        if name in SCORE_WEIGHTS:
+            weights[name] = value
+        elif name in SCORE_PARAMS:
+            score_kwargs[name] = value
+        else:
+            run_kwargs[name] = value
+    total = sum(weights.values())
+    weights = {name: value / total for name, value in weights.items()}
+    return weights, score_kwargs, run_kwargs
+
+
+def _components_key(params: dict):
+    return tuple(sorted((name, value) for name, value in params.items() if name in SCORE_PARAMS))
+
+
+# ---- shared memory ----
+
+def _share(arrays: dict):
+    """Copy each array into its own shared memory block; returns (blocks, spec)."""
+    blocks, spec = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        spec[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, spec
+
+
+_worker = {}
+
+
+def _attach(spec: dict, symbols: list, sentiment):
+    """
+    Pool initializer: map the shared candle arrays as read-only views. A
+    sentiment matrix arrives as the shared "sentiment" block (`sentiment`
+    is then None); a scalar is passed directly.
+    """
+    blocks, data = [], {"symbols": symbols}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        blocks.append(block)
+        data[name] = array
+    _worker.update(
+        blocks=blocks,  # Keep the mappings alive for the worker's lifetime
+        data=data,
+        sentiment=data.pop("sentiment", sentiment),
+        indicators={},
+        components=(None, None),  # (key, components) of the latest parameter key only
+        hist_cache={},
+    )
+
+
+def _evaluate(params: dict) -> dict:
+    data = _worker["data"]
+    weights, score_kwargs, run_kwargs = split_params(params)
+    key = _components_key(params)
+    if _worker["components"][0] != key:
+        _worker["components"] = None, None  # Free the previous key's matrices first
+        _worker["components"] = key, get_score_components_matrix(
+            data["close"], data["volume"], _worker["sentiment"], 0,
+            indicator_cache=_worker["indicators"], **score_kwargs
+        )
+    components = _worker["components"][1]
+    result = run_backtest(
+        data,
+        sentiment=_worker["sentiment"],
+        score_kwargs=score_kwargs,
+        weights=weights,
+        components=components,
+        hist_cache=_worker["hist_cache"],
+        **run_kwargs
+    )
+    summary = {name: value for name, value in result.items() if name not in ("equity_curve", "trades")}
+    summary["params"] = params
+    return summary
+
+
+# ---- driver ----
+
+def rank(results: list, by: str = "return_pct") -> list:
+    """Best first: highest `by`, then smallest drawdown."""
+    return sorted(results, key=lambda r: (-r[by], r["max_drawdown_pct"]))
+
+
+def sweep(data: dict, param_sets: list, workers: int = None, sentiment=0.85,
+          rank_by: str = "return_pct", min_trades: int = 1) -> list:
+    """
+    Backtest every parameter set in `param_sets` over `data` (from
+    `backtest.load_candles`) in a process pool and return the ranked metrics.
+    Sets with fewer than `min_trades` trades are dropped.
+    """
+    arrays = {name: data[name] for name in FIELDS + ("open_time",)}
+    if isinstance(sentiment, np.ndarray):
+        arrays["sentiment"] = sentiment
+        sentiment = None  # Workers read it from shared memory instead of a pickled copy
+    # Sets sharing component parameters land next to each other, and mostly
+    # in the same chunk, so each worker computes the components fewer times.
+    param_sets = sorted(param_sets, key=lambda p: repr(_components_key(p)))
+
+    blocks, spec = _share(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(spec, list(data["symbols"]), sentiment)) as pool:
+            chunksize = max(1, len(param_sets) // ((workers or os.cpu_count() or 1) * 4))
+            results = list(pool.map(_evaluate, param_sets, chunksize=chunksize))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return rank([r for r in results if r["n_trades"] >= min_trades], by=rank_by)
+
+
+def sweep_stored(symbols: list, start_ms: int, end_ms: int, interval: str = "1h",
+                 space: dict = None, n_random: int = None, seed: int = None, **kwargs) -> list:
+    """
+    Load stored candles and sweep `space` (DEFAULT_SPACE if None): the full
+    grid, or `n_random` random samples of it.
+    """
+    space = space or DEFAULT_SPACE
+    param_sets = random_samples(space, n_random, seed) if n_random else grid(space)
+    return sweep(load_candles(symbols, interval, start_ms, end_ms), param_sets, **kwargs)
+
+
+if __name__ == "__main__":
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - 365 * 24 * 3_600_000
+    started = time.time()
+    ranked = sweep_stored(["BTCUSDT", "ETHUSDT", "ADAUSDT"], start_ms, end_ms, n_random=200, seed=1)
+    print(f"Evaluated in {time.time() - started:.1f}s")
+    for result in ranked[:10]:
+        print(f"{result['return_pct']:.2f}% | drawdown {result['max_drawdown_pct']:.2f}% "
+              f"| trades {result['n_trades']} | {result['params']}")
@@ -0,0 +1,72 @@
+"""
+Per-cycle bulk ticker snapshot.
+
+One un-parameterized `/api/v3/ticker/24hr` call returns every symbol. The
+snapshot keeps that response indexed by symbol and only refetches once it is
+older than the TTL, so every coin in a scan cycle reads the same view.
+"""
+import os
+import time
+import threading
+import requests
+
+TICKER_URL = "https://api.binance.com/api/v3/ticker/24hr"
+TICKER_SNAPSHOT_TTL = float(os.getenv("TICKER_SNAPSHOT_TTL", "60"))  # seconds
+
+
+class TickerSnapshot:
+    def __init__(self, ttl: float = TICKER_SNAPSHOT_TTL, url: str = TICKER_URL, session=None):
+        self.ttl = ttl
+        self.url = url
+        self._session = session or requests.Session()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # Held across a fetch so only one caller refreshes
+        self._tickers = {}
+        self.fetched_at = 0.0
+
+    def refresh(self):
+        """Fetch all tickers now, replacing the current view."""
+        response = self._session.get(self.url)
+        if response.status_code != 200:
+            raise ValueError(f"Failed to fetch ticker snapshot: {response.text}")
+        return self.load(response.json())
+
+    def load(self, data: list):
+        """Replace the current view with an already fetched `/ticker/24hr` payload."""
+        tickers = {item["symbol"]: item for item in data}
+        with self._lock:
+            self._tickers = tickers
+            self.fetched_at = time.time()
+        return self
+
+    def is_stale(self):
+        return time.time() - self.fetched_at > self.ttl
+
+    def get(self, symbol: str) -> dict:
+        """Raw 24hr ticker fields for `symbol`, refreshing the snapshot if stale."""
+        if self.is_stale():
+            with self._refresh_lock:
+                if self.is_stale():  # Another caller may have refreshed meanwhile
+                    self.refresh()
+        ticker = self._tickers.get(symbol)
+        if ticker is None:
+            raise ValueError(f"No ticker data for {symbol}")
+        return ticker
+
+    def get_ticker(self, symbol: str):
+        """(current_price, price_change_percent, volume) for `symbol`."""
+        data = self.get(symbol)
+        return float(data["lastPrice"]), float(data["priceChangePercent"]), float(data["volume"])
+
+
+_default_snapshot = None
+_default_lock = threading.Lock()
+
+
+def get_snapshot():
+    """Return the process-wide TickerSnapshot shared by every call site."""
+    global _default_snapshot
+    with _default_lock:
+        if _default_snapshot is None:
+            _default_snapshot = TickerSnapshot()
+        return _default_snapshot